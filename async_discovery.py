@@ -0,0 +1,337 @@
+# async_discovery.py
+# aiobotocore 기반 asyncio 리소스 검색 엔진. 스레드 대신 코루틴으로 API 호출을 겹쳐 실행하고,
+# 전체/계정별/리전별 세마포어로 동시 요청 수를 제한한다. 결과 형식은 aws_config_explorer.get_all_resources 와 동일.
+# 로컬 moto 서버 등 다른 엔드포인트로 보내려면 AWS_ENDPOINT_URL 환경 변수를 지정 (ex: AWS_ENDPOINT_URL=http://localhost:5000 )
+import asyncio
+import contextlib
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional
+
+import botocore
+
+try:
+    from aiobotocore.session import get_session
+except ImportError:  # aiobotocore 가 없으면 기존 스레드 엔진만 사용 가능
+    get_session = None
+
+from aws_config_explorer import (
+    exponential_backoff, build_resource_record, get_catalog_regions, filter_global_resource_types,
+    merge_account_resources, get_target_accounts,
+)
+from circuit_breaker import CircuitBreaker
+from config import (
+    ASYNC_MAX_CONCURRENT_ACCOUNTS, ASYNC_MAX_CONCURRENT_REQUESTS, ASYNC_MAX_REQUESTS_PER_ACCOUNT, ASYNC_MAX_REQUESTS_PER_REGION,
+    RESOURCE_CATALOG_CACHE_DIR, RESOURCE_CATALOG_CACHE_TTL, MAX_RETRIES, AUTO_DISCOVER_REGIONS, SESSION_REFRESH_MARGIN,
+)
+from progress import ProgressReporter
+from region_discovery import (
+    enabled_region_names, record_probe_result, read_region_availability, save_region_availability, live_regions,
+)
+from resource_catalog import catalog_cache_key
+from utils import read_json_cache, write_json_cache
+
+
+class RequestLimiter:
+    """계정별, 리전별, 전체 세마포어를 항상 같은 순서로 잡아서 교착 없이 세 가지 한도를 동시에 지킨다.
+
+    가장 좁은 한도부터 잡으므로, 자기 계정 한도를 기다리는 요청이 전체 슬롯을 쥔 채 다른 계정의 요청을 막지 않는다.
+    """
+
+    def __init__(self, max_requests=ASYNC_MAX_CONCURRENT_REQUESTS,
+                 max_per_account=ASYNC_MAX_REQUESTS_PER_ACCOUNT, max_per_region=ASYNC_MAX_REQUESTS_PER_REGION):
+        self._global = asyncio.Semaphore(max_requests)
+        self._accounts = defaultdict(lambda: asyncio.Semaphore(max_per_account))
+        self._regions = defaultdict(lambda: asyncio.Semaphore(max_per_region))
+
+    @contextlib.asynccontextmanager
+    async def slot(self, account_id: str, region: str):
+        async with self._accounts[account_id], self._regions[region], self._global:
+            yield
+
+
+async def _call_with_retry(limiter, account_id, region, method, max_retries=MAX_RETRIES, **kwargs):
+    for retry in range(max_retries):
+        try:
+            async with limiter.slot(account_id, region):
+                return await method(**kwargs)
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'ThrottlingException' or retry == max_retries - 1:
+                raise
+            sleep_time = exponential_backoff(retry)
+            logging.warning(f"Throttling occurred in account {account_id}, region {region}. Retrying in {sleep_time:.2f} seconds...")
+            await asyncio.sleep(sleep_time)
+
+
+async def _assume_role(aio_session, limiter, account_id: str, role_name: str):
+    """(create_client 에 넘길 자격 증명, 만료 시각)"""
+    role_arn = f"arn:aws:iam::{account_id}:role/{role_name}"
+    async with aio_session.create_client('sts') as sts_client:
+        response = await _call_with_retry(limiter, account_id, 'sts', sts_client.assume_role,
+                                          RoleArn=role_arn, RoleSessionName="AssumeRoleSession1")
+    credentials = response['Credentials']
+    return {
+        'aws_access_key_id': credentials['AccessKeyId'],
+        'aws_secret_access_key': credentials['SecretAccessKey'],
+        'aws_session_token': credentials['SessionToken'],
+    }, credentials.get('Expiration')
+
+
+class AccountCredentials:
+    """한 계정의 AssumeRole 자격 증명을 만료 직전까지 재사용하고, 그 뒤에는 다시 가정한다 (AssumedSessionCache 의 asyncio 버전).
+
+    자격 증명은 클라이언트를 만들 때 고정되므로, 오래 걸리는 작업은 리전/페이지마다 client() 로 새 클라이언트를 만든다.
+    """
+
+    def __init__(self, aio_session, limiter, account_id: str, role_name: str, refresh_margin: int = SESSION_REFRESH_MARGIN):
+        self.aio_session = aio_session
+        self.limiter = limiter
+        self.account_id = account_id
+        self.role_name = role_name
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self._lock = asyncio.Lock()
+        self._credentials = None
+        self._expiration = None
+
+    def _valid(self) -> bool:
+        return self._credentials is not None and (
+            self._expiration is None or datetime.now(timezone.utc) + self.refresh_margin < self._expiration)
+
+    async def get(self) -> Dict:
+        async with self._lock:
+            if not self._valid():
+                self._credentials, self._expiration = await _assume_role(self.aio_session, self.limiter, self.account_id, self.role_name)
+            return self._credentials
+
+    @contextlib.asynccontextmanager
+    async def client(self, service: str, region: str):
+        credentials = await self.get()
+        async with self.aio_session.create_client(service, region_name=region, **credentials) as client:
+            yield client
+
+
+async def _get_resource_catalog(config_client, limiter, account_id: str, region: str, check_recorder=True) -> Dict[str, int]:
+    # resource_catalog.get_resource_catalog 와 같은 캐시 파일/키를 사용
+    # 캐시 파일 입출력은 이벤트 루프를 막지 않도록 스레드에서 실행
+    cache_key = catalog_cache_key(account_id, region)
+    resource_counts = await asyncio.to_thread(read_json_cache, RESOURCE_CATALOG_CACHE_DIR, cache_key, RESOURCE_CATALOG_CACHE_TTL)
+    if resource_counts is not None:
+        return resource_counts
+
+    resource_counts = {}
+    recorders = True
+    if check_recorder:
+        response = await _call_with_retry(limiter, account_id, region, config_client.describe_configuration_recorder_status)
+        recorders = bool(response['ConfigurationRecordersStatus'])
+    if not recorders:
+        logging.warning(f"AWS Config is not enabled in account {account_id}, region {region}.")
+    else:
+        kwargs = {}
+        while True:
+            response = await _call_with_retry(limiter, account_id, region, config_client.get_discovered_resource_counts, **kwargs)
+            for item in response['resourceCounts']:
+                if item['count'] > 0:
+                    resource_counts[item['resourceType']] = item['count']
+            if not response.get('nextToken'):
+                break
+            kwargs['nextToken'] = response['nextToken']
+    await asyncio.to_thread(write_json_cache, RESOURCE_CATALOG_CACHE_DIR, cache_key, resource_counts)
+    return resource_counts
+
+
+async def _get_region_availability(account_credentials, limiter, account_id: str, base_region: str) -> Dict[str, bool]:
+    """region_discovery.get_region_availability 의 asyncio 버전. 같은 캐시를 쓰고, 모든 호출이 RequestLimiter 를 거친다."""
+    availability = await asyncio.to_thread(read_region_availability, account_id)
+    if availability is not None:
+        return availability
+
+    async with account_credentials.client('ec2', base_region) as ec2_client:
+        response = await _call_with_retry(limiter, account_id, base_region, ec2_client.describe_regions)
+    regions = enabled_region_names(response)
+
+    async def probe(region):
+        async with account_credentials.client('config', region) as config_client:
+            response = await _call_with_retry(limiter, account_id, region, config_client.describe_configuration_recorder_status)
+        return bool(response['ConfigurationRecordersStatus'])
+
+    results = await asyncio.gather(*(probe(region) for region in regions), return_exceptions=True)
+    availability = {}
+    complete = True
+    for region, result in zip(regions, results):
+        complete = record_probe_result(availability, account_id, region, result) and complete
+    availability = dict(sorted(availability.items()))
+    await asyncio.to_thread(save_region_availability, account_id, availability, complete)
+    return availability
+
+
+async def _fetch_resource(config_client, limiter, account_id, region, identifier, progress, breaker) -> Optional[Dict]:
+    if breaker.is_blocked(account_id, region):
+        breaker.skip(account_id, region)
+        progress.advance()
+        return None
+    try:
+        response = await _call_with_retry(
+            limiter, account_id, region, config_client.get_resource_config_history,
+            resourceType=identifier['resourceType'],
+            resourceId=identifier['resourceId'],
+            limit=1,
+            earlierTime=datetime(1970, 1, 1, tzinfo=timezone.utc)
+        )
+        if not response['configurationItems']:
+            raise Exception(f"No configuration items found for {identifier['resourceType']}:{identifier['resourceId']}")
+        breaker.record_success(account_id, region)
+        return build_resource_record(response['configurationItems'][0], account_id, region)
+    except Exception as e:
+        breaker.record_error(account_id, region, e)
+        logging.warning(f"Error processing resource {identifier['resourceType']}:{identifier['resourceId']} in account {account_id}, region {region}: {str(e)}")
+        return None
+    finally:
+        progress.advance()
+
+
+async def _list_page(account_credentials, limiter, account_id, region, **kwargs) -> Dict:
+    async with account_credentials.client('config', region) as config_client:
+        return await _call_with_retry(limiter, account_id, region, config_client.list_discovered_resources, **kwargs)
+
+
+async def _fetch_resource_type(account_credentials, limiter, account_id, region, resource_type, progress, breaker) -> List[Dict]:
+    # 한 페이지의 상세 조회를 모두 끝낸 뒤 다음 페이지로 넘어가되, 다음 페이지 목록 조회는 미리 시작해 겹쳐서 진행
+    # (대기 중인 작업은 타입당 최대 한 페이지 분량으로 제한됨)
+    # 리소스가 많은 계정에서 자격 증명이 만료되지 않도록 페이지마다 새 자격 증명으로 클라이언트를 만든다
+    records = []
+    kwargs = {'resourceType': resource_type}
+    next_page = None
+    try:
+        page = await _list_page(account_credentials, limiter, account_id, region, **kwargs)
+        while True:
+            next_page = None
+            if page.get('nextToken') and not breaker.is_blocked(account_id, region):
+                kwargs['nextToken'] = page['nextToken']
+                next_page = asyncio.ensure_future(_list_page(account_credentials, limiter, account_id, region, **kwargs))
+            async with account_credentials.client('config', region) as config_client:
+                results = await asyncio.gather(*(
+                    _fetch_resource(config_client, limiter, account_id, region, identifier, progress, breaker)
+                    for identifier in page['resourceIdentifiers']
+                ))
+            records.extend(record for record in results if record is not None)
+            if next_page is None:
+                break
+            page = await next_page
+    except Exception as e:
+        breaker.record_error(account_id, region, e)
+        logging.error(f"Error fetching {resource_type} in account {account_id}, region {region}: {str(e)}")
+    finally:
+        if next_page is not None and not next_page.done():
+            next_page.cancel()
+    return records
+
+
+async def _process_account(aio_session, limiter, account_id, regions, assume_role_name, progress, breaker,
+                           auto_regions=AUTO_DISCOVER_REGIONS) -> List[Dict]:
+    account_credentials = AccountCredentials(aio_session, limiter, account_id, assume_role_name)
+    try:
+        await account_credentials.get()
+    except Exception as e:
+        # 역할 가정은 계정당 한 번이므로 대상 오류이면 바로 서킷을 연다
+        breaker.record_error(account_id, None, e, trip=True)
+        raise
+    account_regions = regions
+    catalog_regions = get_catalog_regions(regions)
+    if auto_regions:
+        try:
+            availability = await _get_region_availability(account_credentials, limiter, account_id, regions[0])
+        except Exception as e:
+            breaker.record_error(account_id, None, e, trip=True)
+            raise
+        account_regions = catalog_regions = live_regions(availability)
+        if not account_regions:
+            logging.warning(f"AWS Config is not enabled in any region of account {account_id}.")
+            return []
+
+    # 글로벌 리소스 홈 리전은 모든 리전의 카탈로그를 본 뒤에 정할 수 있으므로 카탈로그를 먼저 모은다
+    async def load_catalog(region):
+        if breaker.is_blocked(account_id, region):
+            breaker.skip(account_id, region)
+            return None
+        async with account_credentials.client('config', region) as config_client:
+            try:
+                return await _get_resource_catalog(config_client, limiter, account_id, region, check_recorder=not auto_regions)
+            except Exception as e:
+                breaker.record_error(account_id, region, e)
+                logging.error(f"Error loading resource catalog for account {account_id} in region {region}: {str(e)}")
+                return None
+
+    results = await asyncio.gather(*(load_catalog(region) for region in catalog_regions))
+    catalogs = {region: resource_counts for region, resource_counts in zip(catalog_regions, results) if resource_counts is not None}
+    catalogs = filter_global_resource_types(catalogs, account_regions, regions[0])
+    progress.add_total(sum(sum(resource_counts.values()) for resource_counts in catalogs.values()))
+
+    async def process_region(region, resource_counts):
+        results = await asyncio.gather(*(
+            _fetch_resource_type(account_credentials, limiter, account_id, region, resource_type, progress, breaker)
+            for resource_type in resource_counts
+        ))
+        resources = [record for records in results for record in records]
+        logging.info(f"Total resources fetched for account {account_id} in region {region}: {len(resources)}")
+        return resources
+
+    account_resources = []
+    results = await asyncio.gather(*(process_region(region, counts) for region, counts in catalogs.items() if counts),
+                                   return_exceptions=True)
+    for region, result in zip([region for region, counts in catalogs.items() if counts], results):
+        if isinstance(result, Exception):
+            logging.error(f"Error processing account {account_id} in region {region}: {str(result)}")
+        else:
+            account_resources.extend(result)
+    return account_resources
+
+
+async def get_all_resources_async(session, regions, assume_role_name="OrganizationAccountAccessRole",
+                                  account_ids=None, ou_ids=None, org_tree=None, breaker=None, auto_regions=AUTO_DISCOVER_REGIONS,
+                                  max_concurrent_accounts=ASYNC_MAX_CONCURRENT_ACCOUNTS):
+    """session 은 대상 계정 목록 조회(boto3)와 프로필 이름 확인에만 사용하고, 실제 검색은 aiobotocore 로 수행한다."""
+    if get_session is None:
+        raise ImportError("asyncio 검색 엔진을 사용하려면 aiobotocore 패키지가 필요합니다. (pip install aiobotocore)")
+
+    try:
+        target_accounts = await asyncio.to_thread(get_target_accounts, session, account_ids, ou_ids, org_tree)
+        logging.info(f"Processing {len(target_accounts)} accounts")
+
+        aio_session = get_session()
+        if session.profile_name != 'default':
+            aio_session.set_config_variable('profile', session.profile_name)
+        limiter = RequestLimiter()
+        breaker = breaker or CircuitBreaker()
+        progress = ProgressReporter('discovery')
+        # 동시에 진행하는 계정 수를 제한해 계정별 클라이언트와 대기 작업이 한꺼번에 만들어지지 않게 한다
+        account_slots = asyncio.Semaphore(max_concurrent_accounts)
+
+        async def process_account(account_id):
+            async with account_slots:
+                return await _process_account(aio_session, limiter, str(account_id), regions, assume_role_name, progress, breaker, auto_regions)
+
+        with progress:
+            results = await asyncio.gather(*(process_account(account_id) for account_id in target_accounts), return_exceptions=True)
+
+        resources_by_account = {}
+        for account_id, result in zip(target_accounts, results):
+            if isinstance(result, Exception):
+                logging.error(f"Error processing account {account_id}: {str(result)}")
+                logging.debug("Error details", exc_info=result)
+            else:
+                resources_by_account[str(account_id)] = result
+
+        all_resources, accounts_with_many_resources = merge_account_resources(resources_by_account)
+        logging.info(f"Total resources retrieved: {len(all_resources)}")
+        breaker.log_report()
+        return all_resources, accounts_with_many_resources
+    except Exception as e:
+        logging.error(f"Error in get_all_resources_async: {str(e)}")
+        logging.debug("Error details", exc_info=True)
+        return [], []
+
+
+def get_all_resources_with_asyncio(session, regions, **kwargs):
+    # 동기 코드(main.py)에서 기존 get_all_resources 대신 바로 호출할 수 있는 진입점
+    return asyncio.run(get_all_resources_async(session, regions, **kwargs))
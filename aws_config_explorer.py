@@ -2,16 +2,21 @@
 #AWS Config 서비스를 사용해 명시된 Resource 정보를 가져옴
 import boto3
 import botocore
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import logging
 import concurrent.futures
 import time
-import random
-import traceback
+from collections import defaultdict
 from datetime import datetime, timezone
 
-def exponential_backoff(retry_count):
-    return min(2 ** retry_count + random.random(), 60)
+from org_tree import walk_organization, list_ous, list_accounts, accounts_in_ous
+from circuit_breaker import ACCOUNT_ERROR_CODES, CircuitBreaker, get_error_code
+from config import GLOBAL_RESOURCE_TYPES, GLOBAL_RESOURCE_HOME_REGION, AUTO_DISCOVER_REGIONS
+from progress import ProgressReporter
+from region_discovery import get_region_availability, live_regions
+from resource_catalog import fetch_discovered_resource_counts, get_resource_catalog
+from session_cache import AssumedSessionCache
+from utils import exponential_backoff
 
 def get_accounts_in_ous(org_client, ou_ids):
     accounts = []
@@ -24,21 +29,7 @@ def get_accounts_in_ous(org_client, ou_ids):
     return list(set(accounts))  # 중복 제거
 
 def get_all_ou_ids(org_client):
-    ou_ids = []
-    paginator = org_client.get_paginator('list_roots')
-    for page in paginator.paginate():
-        for root in page['Roots']:
-            ou_ids.extend(get_child_ous(org_client, root['Id']))
-    return ou_ids
-
-def get_child_ous(org_client, parent_id):
-    child_ous = []
-    paginator = org_client.get_paginator('list_organizational_units_for_parent')
-    for page in paginator.paginate(ParentId=parent_id):
-        for ou in page['OrganizationalUnits']:
-            child_ous.append((ou['Id'], ou['Name']))
-            child_ous.extend(get_child_ous(org_client, ou['Id']))
-    return child_ous
+    return list_ous(walk_organization(org_client))
 
 def get_all_accounts(org_client):
     accounts = []
@@ -73,22 +64,103 @@ def get_resource_config_with_retry(config_client, resource_type, resource_id, ac
             else:
                 raise
 
-def get_resources_from_config(session, account_id: str, region: str) -> List[Dict]:
-    config_client = session.client('config', region_name=region)
+def build_resource_record(resource_detail: Dict, account_id: str, region: str) -> Dict:
+    # 생성 날짜 추출
+    create_date = resource_detail.get('resourceCreationTime')
+    if create_date:
+        create_date = create_date.strftime('%Y-%m-%d %H:%M:%S')
+    else:
+        create_date = 'Unknown'
+
+    return {
+        'ARN': resource_detail.get('arn', ''),
+        'Service': resource_detail['resourceType'].split('::')[1].lower(),
+        'Resource Type': resource_detail['resourceType'],
+        'Region': 'global' if resource_detail['resourceType'] in GLOBAL_RESOURCE_TYPES else region,
+        'Account ID': account_id,
+        'Tags': resource_detail.get('tags', {}),
+        'Create Date': create_date
+    }
+
+def get_catalog_regions(regions: List[str]) -> List[str]:
+    # 카탈로그를 조회할 리전: 검색 리전 + 검색 리전 밖에 지정한 글로벌 리소스 홈 리전 (글로벌 타입만 가져오기 위해)
+    if GLOBAL_RESOURCE_HOME_REGION and GLOBAL_RESOURCE_HOME_REGION not in regions:
+        return list(regions) + [GLOBAL_RESOURCE_HOME_REGION]
+    return list(regions)
+
+def select_global_home_region(catalogs: Dict[str, Dict[str, int]], preferred: str = None) -> Optional[str]:
+    # Config 는 includeGlobalResourceTypes 가 켜진 리전에만 글로벌 타입을 기록하므로 (보통 한 리전),
+    # 카탈로그에 글로벌 타입이 있는 리전 중에서 GLOBAL_RESOURCE_HOME_REGION, preferred, 카탈로그 순으로 고른다
+    candidates = dict.fromkeys(region for region in (GLOBAL_RESOURCE_HOME_REGION, preferred, *catalogs) if region in catalogs)
+    return next((region for region in candidates if any(t in GLOBAL_RESOURCE_TYPES for t in catalogs[region])), None)
+
+def filter_global_resource_types(catalogs: Dict[str, Dict[str, int]], regions: List[str], preferred: str = None) -> Dict[str, Dict[str, int]]:
+    """리전별 카탈로그에서 글로벌 리소스(IAM 등)는 계정당 홈 리전 한 곳에만 남긴다. 검색 리전 밖의 홈 리전은 글로벌 타입만 남는다."""
+    home_region = select_global_home_region(catalogs, preferred)
+    filtered = {}
+    for region, resource_counts in catalogs.items():
+        if region == home_region and region in regions:
+            filtered[region] = resource_counts
+        elif region == home_region:
+            filtered[region] = {t: c for t, c in resource_counts.items() if t in GLOBAL_RESOURCE_TYPES}
+        elif region in regions:
+            filtered[region] = {t: c for t, c in resource_counts.items() if t not in GLOBAL_RESOURCE_TYPES}
+    return filtered
+
+def merge_account_resources(resources_by_account: Dict[str, List[Dict]]) -> Tuple[List[Dict], List[Tuple[str, List[Dict]]]]:
+    # 같은 리소스가 여러 리전에서 잡힌 경우를 대비해 ARN 기준으로 중복 제거
+    all_resources = []
+    accounts_with_many_resources = []
+    seen_arns = set()
+    for account_id, account_resources in resources_by_account.items():
+        resources = []
+        for resource in account_resources:
+            if resource['ARN'] and resource['ARN'] in seen_arns:
+                continue
+            seen_arns.add(resource['ARN'])
+            resources.append(resource)
+        all_resources.extend(resources)
+        if len(resources) >= 1000:
+            accounts_with_many_resources.append((account_id, resources))
+    return all_resources, accounts_with_many_resources
+
+def get_resources_from_config(session, account_id: str, region: str, progress=None, resource_counts=None, breaker=None,
+                              session_cache=None) -> List[Dict]:
+    # session_cache 가 주어지면 페이지마다 캐시에서 클라이언트를 받아, 긴 검색 중 자격 증명이 만료되기 전에 새 세션으로 바뀌게 한다
+    if session_cache:
+        get_config_client = lambda: session_cache.client('config', account_id, region)
+    else:
+        config_client = session.client('config', region_name=region)
+        get_config_client = lambda: config_client
     all_resources = []
     
-    supported_resource_types = get_supported_resource_types(session, region)
-    print(f"Supported resource types in account {account_id}, region {region}: {supported_resource_types}")
+    if resource_counts is None:
+        resource_counts = get_resource_catalog(session, account_id, region)
+        if progress:
+            progress.add_total(sum(resource_counts.values()))
+    supported_resource_types = list(resource_counts)
+    logging.debug(f"Supported resource types in account {account_id}, region {region}: {supported_resource_types}")
 
     total_resources_count = 0
 
     for resource_type in supported_resource_types:
+        if breaker and breaker.is_blocked(account_id, region):
+            # 서킷이 열린 계정/리전의 남은 타입은 호출하지 않고 건너뜀
+            breaker.skip(account_id, region)
+            if progress:
+                progress.advance(resource_counts[resource_type])
+            continue
+        processed = 0
         try:
-            print(f"Fetching {resource_type} resources in account {account_id}, region {region}")
-            paginator = config_client.get_paginator('list_discovered_resources')
+            logging.debug(f"Fetching {resource_type} resources in account {account_id}, region {region}")
             resources_count = 0
-            for page in paginator.paginate(resourceType=resource_type):
+            kwargs = {'resourceType': resource_type}
+            while True:
+                config_client = get_config_client()
+                page = config_client.list_discovered_resources(**kwargs)
                 for resource in page['resourceIdentifiers']:
+                    if breaker and breaker.is_blocked(account_id, region):
+                        break
                     try:
                         resource_detail = get_resource_config_with_retry(
                             config_client,
@@ -98,130 +170,151 @@ def get_resources_from_config(session, account_id: str, region: str) -> List[Dic
                             region
                         )
                         
-                        # 생성 날짜 추출
-                        create_date = resource_detail.get('resourceCreationTime')
-                        if create_date:
-                            create_date = create_date.strftime('%Y-%m-%d %H:%M:%S')
-                        else:
-                            create_date = 'Unknown'
-
-                        all_resources.append({
-                            'ARN': resource_detail.get('arn', ''),
-                            'Service': resource_detail['resourceType'].split('::')[1].lower(),
-                            'Resource Type': resource_detail['resourceType'],
-                            'Region': region,
-                            'Account ID': account_id,
-                            'Tags': resource_detail.get('tags', {}),
-                            'Create Date': create_date
-                        })
+                        all_resources.append(build_resource_record(resource_detail, account_id, region))
                         resources_count += 1
                         total_resources_count += 1
-                        if resources_count % 10 == 0:
-                            print(f"{resources_count} {resource_type} resources 가져오는중")
+                        if breaker:
+                            breaker.record_success(account_id, region)
                     except Exception as e:
-                        print(f"Error processing resource {resource['resourceType']}:{resource['resourceId']} in account {account_id}, region {region}: {str(e)}")
-                        continue
-            print(f"Fetched total {resources_count} {resource_type} resources in account {account_id}, region {region}")
+                        if breaker:
+                            breaker.record_error(account_id, region, e)
+                        logging.warning(f"Error processing resource {resource['resourceType']}:{resource['resourceId']} in account {account_id}, region {region}: {str(e)}")
+                    finally:
+                        processed += 1
+                        if progress:
+                            progress.advance()
+                if not page.get('nextToken') or (breaker and breaker.is_blocked(account_id, region)):
+                    break
+                kwargs['nextToken'] = page['nextToken']
+            logging.debug(f"Fetched total {resources_count} {resource_type} resources in account {account_id}, region {region}")
         except Exception as e:
-            print(f"Error fetching {resource_type} in account {account_id}, region {region}: {str(e)}")
+            if breaker:
+                breaker.record_error(account_id, region, e)
+            logging.error(f"Error fetching {resource_type} in account {account_id}, region {region}: {str(e)}")
+        if progress and processed < resource_counts[resource_type]:
+            progress.advance(resource_counts[resource_type] - processed)
     
-    print(f"Total resources fetched for account {account_id} in region {region}: {total_resources_count}")
+    logging.info(f"Total resources fetched for account {account_id} in region {region}: {total_resources_count}")
     return all_resources
 
-#Exception 났을 때 Retry 처리 하기 위한 함수
-def get_resource_config_with_retry(config_client, resource_type, resource_id, account_id, region, max_retries=5):
-    for retry in range(max_retries):
-        try:
-            config_items = config_client.get_resource_config_history(
-                resourceType=resource_type,
-                resourceId=resource_id,
-                limit=1,  # 가장 최근의 구성 항목만 가져옵니다
-                earlierTime=datetime(1970, 1, 1, tzinfo=timezone.utc)  # 가능한 가장 이른 시간부터 조회
-            )['configurationItems']
-            
-            if config_items:
-                return config_items[0]
-            else:
-                raise Exception(f"No configuration items found for {resource_type}:{resource_id}")
-        except botocore.exceptions.ClientError as e:
-            if e.response['Error']['Code'] == 'ThrottlingException':
-                if retry == max_retries - 1:
-                    raise
-                sleep_time = exponential_backoff(retry)
-                logging.warning(f"Throttling occurred for {resource_type}:{resource_id} in account {account_id}, region {region}. Retrying in {sleep_time:.2f} seconds...")
-                time.sleep(sleep_time)
-            else:
-                raise
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_resource_type = {executor.submit(process_resource_type, rt): rt for rt in resource_types}
-        for future in concurrent.futures.as_completed(future_to_resource_type):
-            resource_type = future_to_resource_type[future]
-            try:
-                all_resources.extend(future.result())
-            except Exception as exc:
-                logging.error(f'{resource_type} generated an exception: {exc}')
-    
-    return all_resources
+def get_target_accounts(session, account_ids=None, ou_ids=None, org_tree=None) -> List[str]:
+    # org_tree 가 주어지면 (캐시된 트리) Organizations API 를 다시 호출하지 않는다
+    if account_ids:
+        return account_ids
+    if ou_ids:
+        if org_tree:
+            return accounts_in_ous(org_tree, ou_ids)
+        return get_accounts_in_ous(session.client('organizations'), ou_ids)
+    if org_tree:
+        return [account[0] for account in list_accounts(org_tree)]
+    return [account[0] for account in get_all_accounts(session.client('organizations'))]
 
 def get_all_resources(session, regions, assume_role_name="OrganizationAccountAccessRole", 
                       max_concurrent_accounts=30, max_concurrent_regions=3, 
-                      account_ids=None, ou_ids=None):
+                      account_ids=None, ou_ids=None, org_tree=None, breaker=None, auto_regions=AUTO_DISCOVER_REGIONS,
+                      strict=False):
+    # strict=True 이면 (샤드 검색 등) 계정 전체나 계정/리전 작업이 실패했을 때 빈/일부 결과를 돌려주지 않고 RuntimeError 를 발생시킨다
+    # 역할이 없거나 거부된 계정(서킷 브레이커 대상)은 실행할 때마다 같으므로 실패로 보지 않는다
+    breaker = breaker or CircuitBreaker()
+    failures = []
+    # 계정당 한 번 가정한 역할 세션을 재사용하되, 만료가 가까워지면 다시 가정하고 클라이언트 생성은 락 안에서 한다
+    session_cache = AssumedSessionCache(session, assume_role_name)
     try:
-        org_client = session.client('organizations')
-        
-        if account_ids:
-            target_accounts = account_ids
-        elif ou_ids:
-            target_accounts = get_accounts_in_ous(org_client, ou_ids)
-        else:
-            target_accounts = [account[0] for account in get_all_accounts(org_client)]
+        target_accounts = get_target_accounts(session, account_ids, ou_ids, org_tree)
+        logging.info(f"Target accounts: {', '.join(str(account) for account in target_accounts)}")
+        logging.info(f"Processing {len(target_accounts)} accounts")
 
-        print("Target accounts:")
-        for account in target_accounts:
-            print(f"  {account}")
-        
-        print(f"Processing {len(target_accounts)} accounts")
-
-        all_resources = []
-        accounts_with_many_resources = []
+        catalog_regions = get_catalog_regions(regions)
 
-        def process_account(account_id):
-            print(f"Processing account: {account_id}")
-            account_resources = []
-            for region in regions:
+        # 1단계: 계정별로 역할을 한 번만 가정하고, 리전별 리소스 타입/개수 카탈로그(캐시)를 모은다
+        def plan_account(account_id):
+            try:
+                assumed_session = session_cache.get_session(account_id)
+            except Exception as e:
+                # 역할 가정은 계정당 한 번이므로 대상 오류이면 바로 서킷을 연다
+                breaker.record_error(account_id, None, e, trip=True)
+                raise
+            account_regions, account_catalog_regions = regions, catalog_regions
+            if auto_regions:
+                # 계정마다 활성화된 리전과 Config 사용 여부가 다르므로 Config 가 켜진 리전만 대상으로 삼는다
+                try:
+                    account_regions = live_regions(get_region_availability(session_cache, account_id, regions[0]))
+                except Exception as e:
+                    breaker.record_error(account_id, None, e, trip=True)
+                    raise
+                if not account_regions:
+                    logging.warning(f"AWS Config is not enabled in any region of account {account_id}.")
+                    return {}
+                account_catalog_regions = account_regions
+            catalogs = {}
+            for region in account_catalog_regions:
+                if breaker.is_blocked(account_id, region):
+                    breaker.skip(account_id, region)
+                    continue
                 try:
-                    print(f"Processing account {account_id} in region {region}")
-                    assumed_session = assume_role(session, account_id, assume_role_name)
-                    resources = get_resources_from_config(assumed_session, account_id, region)
-                    account_resources.extend(resources)
-                    print(f"Retrieved {len(resources)} resources from account {account_id} in region {region}")
+                    resource_counts = get_resource_catalog(assumed_session, account_id, region, check_recorder=not auto_regions)
+                    breaker.record_success(account_id, region)
                 except Exception as e:
-                    print(f"Error processing account {account_id} in region {region}: {str(e)}")
-                    print(traceback.format_exc())
-            return account_id, account_resources
+                    breaker.record_error(account_id, region, e)
+                    logging.error(f"Error loading resource catalog for account {account_id} in region {region}: {str(e)}")
+                    logging.debug("Error details", exc_info=True)
+                    continue
+                catalogs[region] = resource_counts
+            return filter_global_resource_types(catalogs, account_regions, regions[0])
 
+        work_items = []  # (예상 리소스 수, account_id, region, resource_counts)
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent_accounts) as executor:
-            future_to_account = {executor.submit(process_account, account_id): account_id for account_id in target_accounts}
-            completed_accounts = 0
+            future_to_account = {executor.submit(plan_account, account_id): account_id for account_id in target_accounts}
             for future in concurrent.futures.as_completed(future_to_account):
                 account_id = future_to_account[future]
                 try:
-                    account_id, resources = future.result()
-                    all_resources.extend(resources)
-                    if len(resources) >= 1000:
-                        accounts_with_many_resources.append((account_id, resources))
-                    completed_accounts += 1
-                    print(f"Completed processing {completed_accounts}/{len(target_accounts)} accounts")
+                    catalogs = future.result()
+                except Exception as e:
+                    logging.error(f"Error processing account {account_id}: {str(e)}")
+                    logging.debug("Error details", exc_info=True)
+                    if get_error_code(e) not in ACCOUNT_ERROR_CODES:
+                        failures.append(f"account {account_id}: {str(e)}")
+                    continue
+                for region, resource_counts in catalogs.items():
+                    if resource_counts:
+                        work_items.append((sum(resource_counts.values()), account_id, region, resource_counts))
+
+        # 2단계: 리소스가 많은 계정/리전부터 처리해서 마지막에 큰 작업 하나만 남는 상황을 줄인다
+        work_items.sort(key=lambda item: item[0], reverse=True)
+        total_estimated = sum(item[0] for item in work_items)
+        logging.info(f"Estimated {total_estimated} resources in {len(work_items)} account-regions")
+
+        resources_by_account = defaultdict(list)
+        progress = ProgressReporter('discovery', total=total_estimated)
+        with progress, concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent_accounts) as executor:
+            future_to_work = {
+                executor.submit(get_resources_from_config, session, account_id, region, progress, resource_counts, breaker, session_cache): (account_id, region)
+                for _, account_id, region, resource_counts in work_items
+            }
+            completed = 0
+            for future in concurrent.futures.as_completed(future_to_work):
+                account_id, region = future_to_work[future]
+                try:
+                    resources_by_account[account_id].extend(future.result())
                 except Exception as e:
-                    print(f"Error processing account {account_id}: {str(e)}")
-                    print(traceback.format_exc())
+                    logging.error(f"Error processing account {account_id} in region {region}: {str(e)}")
+                    logging.debug("Error details", exc_info=True)
+                    failures.append(f"account {account_id}, region {region}: {str(e)}")
+                completed += 1
+                logging.info(f"Completed processing {completed}/{len(work_items)} account-regions")
+
+        all_resources, accounts_with_many_resources = merge_account_resources(resources_by_account)
 
-        print(f"Total resources retrieved: {len(all_resources)}")
+        logging.info(f"Total resources retrieved: {len(all_resources)}")
+        breaker.log_report()
+        if strict and failures:
+            raise RuntimeError(f"Discovery failed for {len(failures)} account(s)/region(s); first: {failures[0]}")
         return all_resources, accounts_with_many_resources
     except Exception as e:
-        print(f"Error in get_all_resources: {str(e)}")
-        print(traceback.format_exc())
+        logging.error(f"Error in get_all_resources: {str(e)}")
+        logging.debug("Error details", exc_info=True)
+        if strict:
+            raise
         return [], []
 
 def assume_role(session, account_id, role_name):
@@ -236,7 +329,7 @@ def assume_role(session, account_id, role_name):
             raise ValueError(f"Invalid account ID: {account_id}")
         
         role_arn = f"arn:aws:iam::{account_id}:role/{role_name}"
-        print(f"Attempting to assume role: {role_arn}")
+        logging.debug(f"Attempting to assume role: {role_arn}")
         
         assumed_role_object = sts_client.assume_role(
             RoleArn=role_arn,
@@ -244,7 +337,7 @@ def assume_role(session, account_id, role_name):
         )
         credentials = assumed_role_object['Credentials']
         
-        print(f"Successfully assumed role for account {account_id}")
+        logging.debug(f"Successfully assumed role for account {account_id}")
         
         return boto3.Session(
             aws_access_key_id=credentials['AccessKeyId'],
@@ -252,19 +345,12 @@ def assume_role(session, account_id, role_name):
             aws_session_token=credentials['SessionToken'],
         )
     except Exception as e:
-        print(f"Error assuming role for account {account_id}: {str(e)}")
-        print(f"Role ARN: {role_arn}")
-        print(traceback.format_exc())
+        logging.debug(f"Error assuming role {role_name} for account {account_id}: {str(e)}")
         raise
 
 def get_supported_resource_types(session, region: str) -> List[str]:
-    config_client = session.client('config', region_name=region)
-    response = config_client.describe_configuration_recorder_status()
-    
-    if not response['ConfigurationRecordersStatus']:
+    resource_counts = fetch_discovered_resource_counts(session, region)
+    if resource_counts is None:
         logging.warning("AWS Config is not enabled in this account/region.")
         return []
-    
-    resource_types = config_client.get_discovered_resource_counts()['resourceCounts']
-    
-    return [item['resourceType'] for item in resource_types]
\ No newline at end of file
+    return list(resource_counts)
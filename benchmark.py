@@ -0,0 +1,452 @@
+# benchmark.py
+# 실제 계정에 접근하지 않고 가상의 대규모 AWS Organization 을 시뮬레이션하여 검색/태깅 처리량을 측정
+# (ex: python benchmark.py --ous 20 --accounts 200 --resources-per-type 50 --latency-ms 20 --throttle-rate 0.01 )
+import argparse
+import contextlib
+import csv
+import json
+import logging
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from unittest import mock
+
+import boto3
+from botocore.awsrequest import AWSResponse
+
+import tagging_operations
+from aws_config_explorer import get_all_resources
+from csv_operations import save_to_csv, update_csv_with_tagged_resources
+
+_RealSession = boto3.Session
+
+DEFAULT_RESOURCE_TYPES = [
+    'AWS::EC2::Instance',
+    'AWS::EC2::SecurityGroup',
+    'AWS::S3::Bucket',
+    'AWS::Lambda::Function',
+    'AWS::RDS::DBInstance',
+    'AWS::IAM::Role',
+]
+
+# Config 가 모든 리전에 중복 기록하는 글로벌 리소스 타입
+SIMULATED_GLOBAL_TYPES = {'AWS::IAM::User', 'AWS::IAM::Group', 'AWS::IAM::Role', 'AWS::IAM::Policy'}
+
+# 쓰로틀링을 주입할 API (실제 환경에서 TPS 제한에 주로 걸리는 호출)
+THROTTLED_OPERATIONS = {'GetResourceConfigHistory', 'TagResources', 'UntagResources', 'GetResources'}
+
+PAGE_SIZE = 100
+
+
+class SimulatedOrganization:
+    """botocore 의 before-call 이벤트 훅으로 API 호출을 가로채 가상의 Organization 응답을 돌려준다.
+
+    botocore Stubber 와 같은 방식(before-parameter-build 에서 파라미터 확인, before-call 에서 응답 반환)이지만,
+    호출 순서에 의존하지 않으므로 여러 스레드에서 동시에 사용할 수 있다.
+    """
+
+    def __init__(self, ou_count: int, account_count: int, regions: List[str], resource_types: List[str],
+                 resources_per_type: int, latency: float = 0.0, throttle_rate: float = 0.0, seed: int = 0,
+                 denied_accounts: int = 0, config_disabled_regions: int = 0, global_recording_region: str = None):
+        self.regions = regions
+        # 마지막 N 개 리전은 Config 레코더가 없는 리전으로 취급
+        self.config_regions = set(regions[:len(regions) - config_disabled_regions])
+        # 지정하면 글로벌 타입은 이 리전의 Config 에만 기록 (includeGlobalResourceTypes 를 한 리전에서만 켠 일반적인 구성)
+        self.global_recording_region = global_recording_region
+        self.resource_types = resource_types
+        self.resources_per_type = resources_per_type
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.api_calls = defaultdict(int)
+        self.tags = {}  # ARN -> 태그 딕셔너리
+
+        self.root_id = 'r-sim0'
+        self.children = defaultdict(list)  # parent_id -> [(ou_id, ou_name)]
+        ou_ids = [self.root_id]
+        for i in range(ou_count):
+            ou_id = f"ou-sim0-{i:08d}"
+            # 앞쪽 OU 들의 자식으로 붙여 깊이가 있는 트리를 만든다
+            parent_id = ou_ids[i // 4] if i // 4 < len(ou_ids) else self.root_id
+            self.children[parent_id].append((ou_id, f"SimOU{i}"))
+            ou_ids.append(ou_id)
+
+        self.accounts = defaultdict(list)  # parent_id -> [account_id]
+        self.account_ids = []
+        for i in range(account_count):
+            account_id = str(100000000000 + i)
+            self.accounts[ou_ids[i % len(ou_ids)]].append(account_id)
+            self.account_ids.append(account_id)
+        # 역할이 없는(AssumeRole 이 거부되는) 계정
+        self.denied_accounts = set(self.account_ids[:denied_accounts])
+
+    # ---- 세션 생성 ----
+
+    def session(self, account_id: str = None, **kwargs):
+        session = _RealSession(
+            aws_access_key_id=kwargs.get('aws_access_key_id', 'ASIASIMULATEDMANAGEMENT'),
+            aws_secret_access_key=kwargs.get('aws_secret_access_key', 'simulated'),
+            aws_session_token=kwargs.get('aws_session_token'),
+            region_name=kwargs.get('region_name', self.regions[0]),
+        )
+        session.events.register('before-parameter-build', self._capture_params)
+        session.events.register('before-call', lambda **kw: self._handle(account_id, **kw))
+        return session
+
+    def _assumed_session_factory(self, **kwargs):
+        # AssumeRole 응답의 AccessKeyId 에 계정 ID 를 넣어두었으므로 이를 통해 대상 계정을 알 수 있다
+        access_key = kwargs.get('aws_access_key_id') or ''
+        account_id = access_key[len('ASIASIM'):] if access_key.startswith('ASIASIM') else None
+        return self.session(account_id, **kwargs)
+
+    @contextlib.contextmanager
+    def patched(self):
+        with mock.patch.object(boto3, 'Session', self._assumed_session_factory):
+            yield
+
+    # ---- 이벤트 핸들러 ----
+
+    def _capture_params(self, params, context, **kwargs):
+        context['simulated_params'] = dict(params)
+
+    def _handle(self, account_id, model, context, **kwargs):
+        service = model.service_model.service_name
+        operation = model.name
+        params = context.get('simulated_params', {})
+        region = context.get('client_region')
+
+        with self.lock:
+            self.api_calls[operation] += 1
+            throttled = operation in THROTTLED_OPERATIONS and self.random.random() < self.throttle_rate
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if throttled:
+            return self._error('ThrottlingException', 'Rate exceeded')
+
+        handler = getattr(self, f"_{service}_{operation}", None)
+        if handler is None:
+            return self._error('UnsupportedOperation', f"{service}:{operation} is not simulated")
+        return handler(account_id, region, params)
+
+    @staticmethod
+    def _ok(body):
+        body.setdefault('ResponseMetadata', {'HTTPStatusCode': 200})
+        return AWSResponse(None, 200, {}, None), body
+
+    @staticmethod
+    def _error(code, message):
+        body = {
+            'Error': {'Code': code, 'Message': message},
+            'ResponseMetadata': {'HTTPStatusCode': 400},
+        }
+        return AWSResponse(None, 400, {}, None), body
+
+    @staticmethod
+    def _page(items, params, token_key, limit=PAGE_SIZE):
+        start = int(params.get(token_key) or 0)
+        next_token = str(start + limit) if start + limit < len(items) else None
+        return items[start:start + limit], next_token
+
+    # ---- 가상 데이터 ----
+
+    def _recorded_types(self, region):
+        if self.global_recording_region in (None, region):
+            return self.resource_types
+        return [t for t in self.resource_types if t not in SIMULATED_GLOBAL_TYPES]
+
+    def _resource_region(self, region, resource_type):
+        return 'global' if resource_type in SIMULATED_GLOBAL_TYPES else region
+
+    def _resource_id(self, account_id, region, resource_type, index):
+        region = self._resource_region(region, resource_type)
+        return f"{resource_type.split('::')[2].lower()}-{account_id}-{region}-{index:06d}"
+
+    def _resource_arn(self, account_id, region, resource_type, resource_id):
+        service = resource_type.split('::')[1].lower()
+        arn_region = '' if resource_type in SIMULATED_GLOBAL_TYPES else region
+        return f"arn:aws:{service}:{arn_region}:{account_id}:{resource_type.split('::')[2].lower()}/{resource_id}"
+
+    # ---- organizations ----
+
+    def _organizations_ListRoots(self, account_id, region, params):
+        return self._ok({'Roots': [{'Id': self.root_id, 'Name': 'Root'}]})
+
+    def _organizations_ListOrganizationalUnitsForParent(self, account_id, region, params):
+        ous = [{'Id': ou_id, 'Name': name} for ou_id, name in self.children[params['ParentId']]]
+        page, next_token = self._page(ous, params, 'NextToken', 20)
+        body = {'OrganizationalUnits': page}
+        if next_token:
+            body['NextToken'] = next_token
+        return self._ok(body)
+
+    def _account(self, account_id):
+        return {'Id': account_id, 'Name': f"sim-{account_id}", 'Status': 'ACTIVE'}
+
+    def _organizations_ListAccountsForParent(self, account_id, region, params):
+        accounts = [self._account(a) for a in self.accounts[params['ParentId']]]
+        page, next_token = self._page(accounts, params, 'NextToken', 20)
+        body = {'Accounts': page}
+        if next_token:
+            body['NextToken'] = next_token
+        return self._ok(body)
+
+    def _organizations_ListAccounts(self, account_id, region, params):
+        accounts = [self._account(a) for a in self.account_ids]
+        page, next_token = self._page(accounts, params, 'NextToken', 20)
+        body = {'Accounts': page}
+        if next_token:
+            body['NextToken'] = next_token
+        return self._ok(body)
+
+    # ---- sts ----
+
+    def _sts_AssumeRole(self, account_id, region, params):
+        target_account = params['RoleArn'].split(':')[4]
+        if target_account in self.denied_accounts:
+            return self._error('AccessDenied', f"Not authorized to perform sts:AssumeRole on {params['RoleArn']}")
+        return self._ok({'Credentials': {
+            'AccessKeyId': f"ASIASIM{target_account}",
+            'SecretAccessKey': 'simulated',
+            'SessionToken': 'simulated',
+            'Expiration': datetime.now(timezone.utc) + timedelta(hours=1),
+        }})
+
+    def _sts_GetCallerIdentity(self, account_id, region, params):
+        account_id = account_id or '000000000000'
+        return self._ok({'Account': account_id, 'Arn': f"arn:aws:iam::{account_id}:user/simulated", 'UserId': 'SIM'})
+
+    # ---- ec2 ----
+
+    def _ec2_DescribeRegions(self, account_id, region, params):
+        return self._ok({'Regions': [
+            {'RegionName': r, 'Endpoint': f"ec2.{r}.amazonaws.com", 'OptInStatus': 'opt-in-not-required'} for r in self.regions
+        ]})
+
+    # ---- config ----
+
+    def _config_DescribeConfigurationRecorderStatus(self, account_id, region, params):
+        if region not in self.config_regions:
+            return self._ok({'ConfigurationRecordersStatus': []})
+        return self._ok({'ConfigurationRecordersStatus': [{'name': 'default', 'recording': True}]})
+
+    def _config_GetDiscoveredResourceCounts(self, account_id, region, params):
+        counts = [{'resourceType': t, 'count': self.resources_per_type} for t in self._recorded_types(region)]
+        page, next_token = self._page(counts, params, 'nextToken', params.get('limit') or PAGE_SIZE)
+        body = {'totalDiscoveredResources': len(counts) * self.resources_per_type, 'resourceCounts': page}
+        if next_token:
+            body['nextToken'] = next_token
+        return self._ok(body)
+
+    def _config_ListDiscoveredResources(self, account_id, region, params):
+        resource_type = params['resourceType']
+        identifiers = [
+            {'resourceType': resource_type, 'resourceId': self._resource_id(account_id, region, resource_type, i)}
+            for i in range(self.resources_per_type if resource_type in self._recorded_types(region) else 0)
+        ]
+        page, next_token = self._page(identifiers, params, 'nextToken', params.get('limit') or PAGE_SIZE)
+        body = {'resourceIdentifiers': page}
+        if next_token:
+            body['nextToken'] = next_token
+        return self._ok(body)
+
+    def _config_GetResourceConfigHistory(self, account_id, region, params):
+        resource_type = params['resourceType']
+        resource_id = params['resourceId']
+        arn = self._resource_arn(account_id, region, resource_type, resource_id)
+        with self.lock:
+            tags = dict(self.tags.get(arn, {'Name': resource_id}))
+        return self._ok({'configurationItems': [{
+            'accountId': account_id,
+            'arn': arn,
+            'resourceType': resource_type,
+            'resourceId': resource_id,
+            'awsRegion': self._resource_region(region, resource_type),
+            'resourceCreationTime': datetime(2024, 1, 1, tzinfo=timezone.utc),
+            'tags': tags,
+        }]})
+
+    # ---- resourcegroupstaggingapi ----
+
+    def _resourcegroupstaggingapi_TagResources(self, account_id, region, params):
+        with self.lock:
+            for arn in params['ResourceARNList']:
+                self.tags.setdefault(arn, {}).update(params['Tags'])
+        return self._ok({'FailedResourcesMap': {}})
+
+    def _resourcegroupstaggingapi_UntagResources(self, account_id, region, params):
+        with self.lock:
+            for arn in params['ResourceARNList']:
+                for key in params['TagKeys']:
+                    self.tags.get(arn, {}).pop(key, None)
+        return self._ok({'FailedResourcesMap': {}})
+
+    def _resourcegroupstaggingapi_GetResources(self, account_id, region, params):
+        with self.lock:
+            mappings = [
+                {'ResourceARN': arn, 'Tags': [{'Key': k, 'Value': v} for k, v in self.tags[arn].items()]}
+                for arn in params.get('ResourceARNList', []) if arn in self.tags
+            ]
+        return self._ok({'ResourceTagMappingList': mappings, 'PaginationToken': ''})
+
+    # ---- 측정 ----
+
+    def reset_counters(self):
+        with self.lock:
+            self.api_calls.clear()
+
+    def total_api_calls(self) -> int:
+        with self.lock:
+            return sum(self.api_calls.values())
+
+
+def peak_rss_mb() -> float:
+    # Linux 에서 ru_maxrss 단위는 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextlib.contextmanager
+def quiet():
+    # 워커 스레드의 print/logging 출력이 측정을 방해하지 않도록 막는다
+    logging.disable(logging.CRITICAL)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            yield
+        finally:
+            logging.disable(logging.NOTSET)
+
+
+def measure(name: str, sim: SimulatedOrganization, func, item_count=None) -> Dict:
+    sim.reset_counters()
+    start = time.perf_counter()
+    with quiet():
+        result = func()
+    elapsed = time.perf_counter() - start
+    items = item_count(result) if item_count else len(result)
+    api_calls = sim.total_api_calls()
+    return {
+        'stage': name,
+        'resources': items,
+        'seconds': round(elapsed, 3),
+        'resources_per_sec': round(items / elapsed, 1) if elapsed else 0.0,
+        'api_calls': api_calls,
+        'api_calls_per_resource': round(api_calls / items, 2) if items else 0.0,
+        'api_calls_by_operation': dict(sim.api_calls),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'result': result,
+    }
+
+
+def count_csv_rows(filename: str) -> int:
+    with open(filename, 'r', newline='', encoding='utf-8') as csvfile:
+        return sum(1 for _ in csv.DictReader(csvfile))
+
+
+def run_benchmark(args) -> List[Dict]:
+    sim = SimulatedOrganization(
+        ou_count=args.ous,
+        account_count=args.accounts,
+        regions=args.regions,
+        resource_types=args.resource_types,
+        resources_per_type=args.resources_per_type,
+        latency=args.latency_ms / 1000,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed,
+        denied_accounts=args.denied_accounts,
+        config_disabled_regions=args.config_disabled_regions,
+        global_recording_region=args.global_recording_region,
+    )
+    session = sim.session()
+    results = []
+
+    # 캐시 파일(.tagtool_cache)이 이전 실행 결과를 재사용하지 않도록 임시 디렉터리에서 실행
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.chdir(tmpdir)
+        try:
+            with sim.patched():
+                discovery = measure('discovery', sim, lambda: get_all_resources(
+                    session=session,
+                    regions=args.regions,
+                    max_concurrent_accounts=args.max_concurrent_accounts,
+                    auto_regions=args.auto_regions,
+                ), item_count=lambda r: len(r[0]))
+                resources = discovery.pop('result')[0]
+                results.append(discovery)
+
+                tag_inputs = iter(['benchmark', 'true', 'benchmark'])
+                with mock.patch.object(tagging_operations, 'safe_input', lambda prompt: next(tag_inputs)):
+                    add = measure('add_tags_from_csv', sim,
+                                  lambda: tagging_operations.add_tags_from_csv(session, resources))
+                    tagged_resources = add.pop('result')
+                    results.append(add)
+
+                    verify = measure('verify_tagged_resources', sim,
+                                     lambda: tagging_operations.verify_tagged_resources(session, tagged_resources, 'benchmark', 'true'))
+                    verify.pop('result')
+                    results.append(verify)
+
+                    remove = measure('remove_tags_from_csv', sim,
+                                     lambda: tagging_operations.remove_tags_from_csv(session, resources))
+                    remove.pop('result')
+                    results.append(remove)
+
+            filename = os.path.join(tmpdir, 'aws_resources_benchmark.csv')
+            save_to_csv(resources, filename)
+            update = measure('update_csv_with_tagged_resources', sim,
+                             lambda: update_csv_with_tagged_resources(filename, tagged_resources),
+                             item_count=lambda _: count_csv_rows(filename))
+            update.pop('result')
+            results.append(update)
+        finally:
+            os.chdir(cwd)
+
+    return results
+
+
+def print_report(args, results: List[Dict]) -> None:
+    print(f"Simulated organization: {args.ous} OUs, {args.accounts} accounts, "
+          f"{len(args.regions)} regions, {len(args.resource_types)} types x {args.resources_per_type} resources, "
+          f"latency {args.latency_ms}ms, throttle rate {args.throttle_rate}")
+    print(f"{'stage':<34}{'resources':>10}{'seconds':>10}{'res/sec':>12}{'calls/res':>11}{'peak RSS MB':>13}")
+    for r in results:
+        print(f"{r['stage']:<34}{r['resources']:>10}{r['seconds']:>10}{r['resources_per_sec']:>12}"
+              f"{r['api_calls_per_resource']:>11}{r['peak_rss_mb']:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline throughput benchmark against a simulated AWS Organization')
+    parser.add_argument('--ous', type=int, default=10, help='Number of OUs in the simulated organization')
+    parser.add_argument('--accounts', type=int, default=50, help='Number of active accounts')
+    parser.add_argument('--regions', nargs='+', default=['ap-northeast-2'], help='Regions to scan')
+    parser.add_argument('--resource-types', nargs='+', default=DEFAULT_RESOURCE_TYPES, help='Resource types per account-region')
+    parser.add_argument('--resources-per-type', type=int, default=20, help='Resources per type in each account-region')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Injected latency per API call (ms)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Probability of ThrottlingException on throttled operations')
+    parser.add_argument('--max-concurrent-accounts', type=int, default=10, help='Worker threads for discovery')
+    parser.add_argument('--denied-accounts', type=int, default=0, help='Number of accounts whose AssumeRole is denied')
+    parser.add_argument('--config-disabled-regions', type=int, default=0, help='Number of regions (from the end of --regions) without a Config recorder')
+    parser.add_argument('--global-recording-region', help='Record global resource types (IAM) only in this region')
+    parser.add_argument('--auto-regions', action='store_true', help='Enumerate enabled regions per account instead of scanning --regions')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for throttling injection')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    print_report(args, results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# circuit_breaker.py
+# 역할이 없거나 거부된 계정, Config 레코더가 없는 계정/리전에 대해 같은 실패를 반복하지 않도록 하는 서킷 브레이커
+import logging
+import threading
+from collections import defaultdict
+from typing import List, Dict
+
+import botocore
+
+from config import CIRCUIT_BREAKER_THRESHOLD
+
+# 계정 단위로 실패를 세는 오류 (역할 없음/권한 거부)
+ACCOUNT_ERROR_CODES = {'AccessDenied', 'AccessDeniedException', 'NoSuchEntity', 'UnauthorizedOperation'}
+# 계정/리전 단위로 실패를 세는 오류 (Config 미사용)
+CONFIG_UNAVAILABLE_ERROR_CODES = {'NoAvailableConfigurationRecorderException'}
+
+def get_error_code(error: Exception) -> str:
+    if isinstance(error, botocore.exceptions.ClientError):
+        return error.response.get('Error', {}).get('Code', '')
+    return ''
+
+class CircuitBreaker:
+    """키(account_id 또는 (account_id, region))별로 연속 실패를 세고, threshold 에 도달하면 열려서 남은 작업을 바로 건너뛴다.
+
+    성공하면 연속 실패 수는 0 으로 돌아가지만, 한 번 열린 키는 실행이 끝날 때까지 열린 상태를 유지한다.
+    """
+
+    def __init__(self, threshold: int = CIRCUIT_BREAKER_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._failures = defaultdict(int)
+        self._open = {}  # key -> 마지막 오류 메시지
+        self._skipped = defaultdict(int)
+
+    @staticmethod
+    def _key_for(account_id, region, error):
+        code = get_error_code(error)
+        if code in ACCOUNT_ERROR_CODES:
+            return str(account_id)
+        if code in CONFIG_UNAVAILABLE_ERROR_CODES and region:
+            return (str(account_id), region)
+        return None
+
+    def is_blocked(self, account_id, region: str = None) -> bool:
+        with self._lock:
+            return str(account_id) in self._open or (str(account_id), region) in self._open
+
+    def skip(self, account_id, region: str = None, count: int = 1) -> None:
+        # 열린 키에 건너뛴 작업 수를 기록
+        with self._lock:
+            key = str(account_id) if str(account_id) in self._open else (str(account_id), region)
+            self._skipped[key] += count
+
+    def record_success(self, account_id, region: str = None) -> None:
+        with self._lock:
+            self._failures.pop(str(account_id), None)
+            self._failures.pop((str(account_id), region), None)
+
+    def record_error(self, account_id, region: str, error: Exception, trip: bool = False) -> bool:
+        """서킷 브레이커 대상 오류이면 True. trip=True 이면 (예: 계정당 한 번뿐인 AssumeRole 실패) 바로 연다."""
+        key = self._key_for(account_id, region, error)
+        if key is None:
+            return False
+        with self._lock:
+            self._failures[key] += 1
+            if key not in self._open and (trip or self._failures[key] >= self.threshold):
+                self._open[key] = f"{get_error_code(error)}: {str(error)}"
+                logging.warning(f"Circuit opened for {self._format_key(key)} after {self._failures[key]} failures; skipping remaining work")
+        return True
+
+    @staticmethod
+    def _format_key(key) -> str:
+        return f"account {key}" if isinstance(key, str) else f"account {key[0]}, region {key[1]}"
+
+    def report(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {
+                    'Account ID': key if isinstance(key, str) else key[0],
+                    'Region': '' if isinstance(key, str) else key[1],
+                    'Reason': reason,
+                    'Failures': self._failures[key],
+                    'Skipped': self._skipped[key],
+                }
+                for key, reason in sorted(self._open.items(), key=lambda item: str(item[0]))
+            ]
+
+    def log_report(self, title: str = "건너뛴 계정/리전") -> None:
+        entries = self.report()
+        if not entries:
+            return
+        logging.warning(f"{title}: {len(entries)}개")
+        for entry in entries:
+            scope = entry['Account ID'] + (f" ({entry['Region']})" if entry['Region'] else '')
+            logging.warning(f"  - {scope}: 실패 {entry['Failures']}회, 건너뛴 작업 {entry['Skipped']}개 - {entry['Reason']}")
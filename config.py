@@ -6,6 +6,11 @@ SSO_PROFILE = 'shared'
 # 검색할 리전 목록
 REGIONS = ['ap-northeast-2']
 
+# True 이면 REGIONS 대신 계정별로 활성화된(옵트인된) 모든 리전을 조회하고, Config 레코더가 있는 리전만 검색
+# (이때 REGIONS 의 첫 번째 리전은 리전 목록 조회와 글로벌 리소스 홈 리전의 기본값으로 사용)
+# 실행할 때 main.py / sharded_discovery.py 의 --auto-regions, --no-auto-regions 로 바꿀 수 있다
+AUTO_DISCOVER_REGIONS = False
+
 # 태그 작업 시 사용할 역할 이름 (예: OrganizationAccountAccessRole)
 ASSUME_ROLE_NAME = 'OrganizationAccountAccessRole'
 
@@ -18,4 +23,61 @@ MAX_CONCURRENT_REGIONS = 3
 # 리트라이 설정
 MAX_RETRIES = 10
 INITIAL_BACKOFF = 1  # seconds
-MAX_BACKOFF = 60  # seconds
\ No newline at end of file
+MAX_BACKOFF = 60  # seconds
+
+# 진행률 리포트 출력 주기
+PROGRESS_REPORT_INTERVAL = 10  # seconds
+
+# Organizations OU 트리 캐시 (디렉터리, 유효 시간) 및 트리 탐색 시 동시 호출 수
+ORG_TREE_CACHE_DIR = '.tagtool_cache/org_tree'
+ORG_TREE_CACHE_TTL = 6 * 60 * 60  # seconds
+ORG_WALK_MAX_WORKERS = 4
+
+# 계정/리전별 Config 리소스 타입 카탈로그 캐시 (디렉터리, 유효 시간)
+RESOURCE_CATALOG_CACHE_DIR = '.tagtool_cache/resource_catalog'
+RESOURCE_CATALOG_CACHE_TTL = 60 * 60  # seconds
+
+# 글로벌 리소스 타입: 모든 리전의 Config 에 중복 기록되므로 홈 리전에서만 검색하고, Region 은 'global' 로 저장
+GLOBAL_RESOURCE_TYPES = ['AWS::IAM::User', 'AWS::IAM::Group', 'AWS::IAM::Role', 'AWS::IAM::Policy']
+# 홈 리전은 계정별로 Config 카탈로그에 글로벌 타입이 기록된 리전(includeGlobalResourceTypes 가 켜진 리전) 중에서 고른다.
+# 아래 값(없으면 REGIONS 의 첫 번째 리전)이 그런 리전이면 우선 사용
+GLOBAL_RESOURCE_HOME_REGION = None
+# 글로벌 리소스 태깅 시 사용할 Resource Groups Tagging API 리전
+GLOBAL_TAGGING_REGION = 'us-east-1'
+
+# 리소스 검색 엔진: 'threads' (ThreadPoolExecutor) 또는 'asyncio' (aiobotocore 필요)
+DISCOVERY_ENGINE = 'threads'
+
+# asyncio 엔진에서 동시에 처리할 최대 계정 수
+ASYNC_MAX_CONCURRENT_ACCOUNTS = 20
+
+# asyncio 엔진의 동시 요청 한도 (전체 / 계정별 / 리전별)
+ASYNC_MAX_CONCURRENT_REQUESTS = 100
+ASYNC_MAX_REQUESTS_PER_ACCOUNT = 20
+ASYNC_MAX_REQUESTS_PER_REGION = 50
+
+# 같은 계정(또는 계정/리전)에서 AccessDenied, NoSuchEntity, NoAvailableConfigurationRecorderException 이
+# 연속으로 이 횟수만큼 발생하면 남은 작업을 건너뜀
+CIRCUIT_BREAKER_THRESHOLD = 3
+
+# 태깅 후 실제 적용된 태그를 다시 읽어 검증할지 여부, 한 번에 조회할 ARN 수(최대 100), 불일치 시 재시도 횟수
+VERIFY_TAGS_AFTER_TAGGING = False
+VERIFY_BATCH_SIZE = 100
+VERIFY_MAX_RETRIES = 3
+
+# 인벤토리 비교 시 파티션 하나의 목표 크기 (이보다 큰 파일은 ARN 해시로 나누어 비교)
+DIFF_PARTITION_TARGET_BYTES = 64 * 1024 * 1024
+
+# AssumeRole 로 받은 세션을 만료 몇 초 전까지 재사용할지
+SESSION_REFRESH_MARGIN = 300  # seconds
+
+# 태깅 서비스(데몬) 주소. 외부에 노출되지 않도록 localhost 에만 바인딩
+TAGGING_SERVICE_HOST = '127.0.0.1'
+TAGGING_SERVICE_PORT = 8765
+# 태깅 서비스가 시작할 때마다 새로 만드는 Bearer 토큰을 저장할 파일 (권한 0600)
+TAGGING_SERVICE_TOKEN_FILE = '.tagtool_cache/tagging_service.token'
+
+# 계정별 리전 활성화/Config 레코더 여부 캐시 (디렉터리, 유효 시간) 및 리전 확인 시 동시 호출 수
+REGION_AVAILABILITY_CACHE_DIR = '.tagtool_cache/region_availability'
+REGION_AVAILABILITY_CACHE_TTL = 6 * 60 * 60  # seconds
+REGION_PROBE_MAX_WORKERS = 8
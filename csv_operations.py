@@ -7,10 +7,11 @@ import logging
 
 from typing import List, Dict
 
+RESOURCE_FIELDNAMES = ['ARN', 'Service', 'Resource Type', 'Region', 'Account ID', 'Tags', 'Create Date']
+
 def save_to_csv(resources: List[Dict], filename: str) -> None:
     with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['ARN', 'Service', 'Resource Type', 'Region', 'Account ID', 'Tags', 'Create Date']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer = csv.DictWriter(csvfile, fieldnames=RESOURCE_FIELDNAMES)
 
         writer.writeheader()
         for resource in resources:
@@ -1,36 +1,33 @@
 #다른 메인 기능들과 상관 없이, 별도로 Config 를 통해 불러 올 수 있는 서비스들을 나열. SSO Profile 및 Region 정보 필요 (ex: python get_supported_resource_types.py --profile shared --region ap-northeast-2 )
+#리소스 검색과 같은 카탈로그 캐시(resource_catalog)를 사용하며, --refresh 로 캐시를 무시하고 다시 조회할 수 있음
 import boto3
 import argparse
 
-def get_discovered_resource_types(session, region):
-    config_client = session.client('config', region_name=region)
-    
-    try:
-        response = config_client.get_discovered_resource_counts()
-        resource_types = [item['resourceType'] for item in response['resourceCounts']]
-        return sorted(resource_types)
-    except config_client.exceptions.NoAvailableConfigurationRecorderException:
-        print("Error: AWS Config is not enabled in this region.")
-        return []
+from resource_catalog import get_resource_catalog
+
+def get_discovered_resource_types(session, region, refresh=False):
+    account_id = session.client('sts').get_caller_identity()['Account']
+    return get_resource_catalog(session, account_id, region, refresh=refresh)
 
 def main():
     parser = argparse.ArgumentParser(description='Get discovered resource types from AWS Config')
     parser.add_argument('--profile', default='default', help='AWS profile name')
     parser.add_argument('--region', default='ap-northeast-2', help='AWS region')
+    parser.add_argument('--refresh', action='store_true', help='Ignore the cached catalog and query AWS Config again')
     args = parser.parse_args()
 
     try:
         session = boto3.Session(profile_name=args.profile)
-        discovered_types = get_discovered_resource_types(session, args.region)
+        discovered_types = get_discovered_resource_types(session, args.region, args.refresh)
 
         if discovered_types:
             print(f"Discovered resource types in region {args.region}:")
-            for resource_type in discovered_types:
-                print(f"- {resource_type}")
+            for resource_type, count in sorted(discovered_types.items()):
+                print(f"- {resource_type} ({count})")
         else:
             print("No resource types discovered or AWS Config is not enabled.")
     except Exception as e:
         print(f"An error occurred: {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
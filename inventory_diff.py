@@ -0,0 +1,151 @@
+# inventory_diff.py
+# 두 인벤토리 CSV(save_to_csv 결과)를 ARN 기준 해시 조인으로 비교해 추가/삭제/태그 변경 리소스를 찾아냄
+# 파일이 크면 ARN 해시로 여러 파티션 파일에 나눈 뒤 파티션 단위로 비교하므로 메모리 사용량이 파티션 크기로 제한됨
+# (ex: python inventory_diff.py aws_resources_20240101.csv aws_resources_20240102.csv --drift drift.csv )
+# (ex: python inventory_diff.py --latest . --drift drift.csv )
+# --drift 로 저장한 파일은 main.py 의 '4. CSV로 태깅 작업 수행' 에 그대로 입력할 수 있음
+import argparse
+import contextlib
+import csv
+import glob
+import logging
+import os
+import re
+import tempfile
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import DIFF_PARTITION_TARGET_BYTES
+from csv_operations import RESOURCE_FIELDNAMES
+from logging_config import setup_logging
+from utils import parse_tags
+
+DIFF_FIELDNAMES = ['Change', 'ARN', 'Account ID', 'Region', 'Resource Type', 'Tag Key', 'Old Value', 'New Value']
+# 태그 키가 없었거나(추가) 없어진(삭제) 경우 Old Value / New Value 에 쓰는 값. 빈 문자열 태그 값과 구분하기 위함
+MISSING_TAG_VALUE = '<missing>'
+
+def tag_deltas(old_tags: Dict, new_tags: Dict) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    # (키, 이전 값, 새 값). 키가 새로 생기면 이전 값이 None, 없어지면 새 값이 None
+    deltas = []
+    for key in sorted(set(old_tags) | set(new_tags)):
+        old_value, new_value = old_tags.get(key), new_tags.get(key)
+        if old_value != new_value or (key in old_tags) != (key in new_tags):
+            deltas.append((key, old_value, new_value))
+    return deltas
+
+def _read_rows(filename: str) -> Iterator[Dict]:
+    with open(filename, 'r', newline='', encoding='utf-8') as csvfile:
+        yield from csv.DictReader(csvfile)
+
+def _partition_count(*filenames: str) -> int:
+    largest = max(os.path.getsize(f) for f in filenames)
+    return max(1, -(-largest // DIFF_PARTITION_TARGET_BYTES))
+
+def _partition(filename: str, partitions: int, directory: str, label: str) -> List[str]:
+    # zlib.crc32 는 실행마다 값이 같으므로 두 파일의 같은 ARN 이 항상 같은 파티션으로 간다
+    paths = [os.path.join(directory, f"{label}-{i:04d}.csv") for i in range(partitions)]
+    with contextlib.ExitStack() as stack:
+        writers = []
+        for path in paths:
+            writer = csv.DictWriter(stack.enter_context(open(path, 'w', newline='', encoding='utf-8')),
+                                    fieldnames=RESOURCE_FIELDNAMES, extrasaction='ignore')
+            writer.writeheader()
+            writers.append(writer)
+        for row in _read_rows(filename):
+            writers[zlib.crc32(row['ARN'].encode('utf-8')) % partitions].writerow(row)
+    return paths
+
+def diff_inventories(old_file: str, new_file: str, partitions: int = None) -> Iterator[Tuple[str, Optional[Dict], Optional[Dict]]]:
+    """('added' | 'removed' | 'tag_changed', 이전 행, 새 행) 을 차례로 돌려준다.
+
+    한 번에 메모리에 올리는 것은 이전 파일의 파티션 하나(ARN -> 행)뿐이고, 새 파일은 스트리밍으로 읽는다.
+    """
+    partitions = partitions or _partition_count(old_file, new_file)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if partitions == 1:
+            pairs = [(old_file, new_file)]
+        else:
+            logging.info(f"Partitioning inventories into {partitions} partitions")
+            pairs = list(zip(_partition(old_file, partitions, tmpdir, 'old'), _partition(new_file, partitions, tmpdir, 'new')))
+
+        for old_part, new_part in pairs:
+            old_rows = {row['ARN']: row for row in _read_rows(old_part)}
+            for new_row in _read_rows(new_part):
+                old_row = old_rows.pop(new_row['ARN'], None)
+                if old_row is None:
+                    yield 'added', None, new_row
+                elif parse_tags(old_row['Tags']) != parse_tags(new_row['Tags']):
+                    yield 'tag_changed', old_row, new_row
+            for old_row in old_rows.values():
+                yield 'removed', old_row, None
+
+def write_diff(old_file: str, new_file: str, report_file: str, drift_file: str = None, partitions: int = None) -> Dict[str, int]:
+    counts = {'added': 0, 'removed': 0, 'tag_changed': 0}
+    with contextlib.ExitStack() as stack:
+        report = csv.DictWriter(stack.enter_context(open(report_file, 'w', newline='', encoding='utf-8')), fieldnames=DIFF_FIELDNAMES)
+        report.writeheader()
+        drift = None
+        if drift_file:
+            drift = csv.DictWriter(stack.enter_context(open(drift_file, 'w', newline='', encoding='utf-8')),
+                                   fieldnames=RESOURCE_FIELDNAMES, extrasaction='ignore')
+            drift.writeheader()
+
+        for change, old_row, new_row in diff_inventories(old_file, new_file, partitions):
+            counts[change] += 1
+            row = new_row or old_row
+            base = {
+                'Change': change,
+                'ARN': row['ARN'],
+                'Account ID': row['Account ID'],
+                'Region': row['Region'],
+                'Resource Type': row['Resource Type'],
+            }
+            if change == 'tag_changed':
+                for key, old_value, new_value in tag_deltas(parse_tags(old_row['Tags']), parse_tags(new_row['Tags'])):
+                    report.writerow({
+                        **base,
+                        'Tag Key': key,
+                        'Old Value': MISSING_TAG_VALUE if old_value is None else old_value,
+                        'New Value': MISSING_TAG_VALUE if new_value is None else new_value,
+                    })
+            else:
+                report.writerow(base)
+            # 태깅 흐름의 입력으로 쓸 수 있도록 현재(새 스냅샷) 상태의 행만 내보낸다
+            if drift and new_row:
+                drift.writerow(new_row)
+
+    logging.info(f"Inventory diff: {counts['added']} added, {counts['removed']} removed, {counts['tag_changed']} tag changed")
+    return counts
+
+def find_latest_snapshots(directory: str, prefix: str = 'aws_resources_') -> Tuple[str, str]:
+    # get_csv_filename 이 붙이는 타임스탬프(YYYYmmddHHMMSS) 덕분에 이름순 정렬이 곧 시간순
+    # (aws_resources_merged.csv 같은 다른 파일이 최신 스냅샷으로 잡히지 않도록 타임스탬프 형식만 허용)
+    pattern = re.compile(re.escape(prefix) + r'\d{14}\.csv$')
+    snapshots = sorted(f for f in glob.glob(os.path.join(directory, f"{prefix}*.csv")) if pattern.match(os.path.basename(f)))
+    if len(snapshots) < 2:
+        raise FileNotFoundError(f"'{directory}'에 비교할 스냅샷({prefix}*.csv)이 2개 이상 필요합니다.")
+    return snapshots[-2], snapshots[-1]
+
+def main():
+    parser = argparse.ArgumentParser(description='Diff two inventory CSV files and detect tag drift')
+    parser.add_argument('old', nargs='?', help='Older inventory CSV')
+    parser.add_argument('new', nargs='?', help='Newer inventory CSV')
+    parser.add_argument('--latest', metavar='DIR', help='Compare the two most recent aws_resources_*.csv in DIR')
+    parser.add_argument('-o', '--output', default='inventory_diff.csv', help='Diff report CSV')
+    parser.add_argument('--drift', help='Write added and tag-changed resources as a tagging input CSV')
+    parser.add_argument('--partitions', type=int, help='Number of hash partitions (default: based on file size)')
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.latest:
+        old_file, new_file = find_latest_snapshots(args.latest)
+    elif args.old and args.new:
+        old_file, new_file = args.old, args.new
+    else:
+        parser.error('old and new files, or --latest DIR, are required')
+
+    logging.info(f"Comparing '{old_file}' -> '{new_file}'")
+    write_diff(old_file, new_file, args.output, args.drift, args.partitions)
+
+if __name__ == "__main__":
+    main()
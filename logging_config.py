@@ -1,15 +1,30 @@
 # logging_config.py
 # 로깅 관련 함수
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 
 def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S',
-        handlers=[
-            logging.FileHandler('tagging_tool.log'),
-            logging.StreamHandler(sys.stdout)  # 이 줄을 추가합니다.
-        ]
-    )
\ No newline at end of file
+    # 워커 스레드들이 파일/stdout 락에서 대기하지 않도록 큐에만 넣고, 실제 기록은 백그라운드 리스너가 담당
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    handlers = [
+        logging.FileHandler('tagging_tool.log'),
+        logging.StreamHandler(sys.stdout)
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
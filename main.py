@@ -1,19 +1,22 @@
 # -*- coding: utf-8 -*-
 # 메인 함수. 리소스 정보를 검색, 태깅, csv export 등을 정의
+import argparse
 import boto3
 import sys
 import io
 import os
+import traceback
 
 from datetime import datetime
 from collections import defaultdict
-from aws_config_explorer import get_all_resources, get_supported_resource_types, get_all_accounts, get_all_ou_ids
+from aws_config_explorer import get_all_resources, get_supported_resource_types
+from org_tree import load_org_tree, list_accounts, list_ous
 from tagging_operations import add_tags, remove_tags, add_tags_from_csv, remove_tags_from_csv
 from csv_operations import save_to_csv, save_tagged_resources_to_csv, read_csv_for_tagging, update_csv_with_tagged_resources
 from utils import select_account_or_resource, get_csv_filename, safe_input
 import logging
 from logging_config import setup_logging
-from config import SSO_PROFILE, REGIONS, ASSUME_ROLE_NAME, MAX_CONCURRENT_ACCOUNTS, MAX_CONCURRENT_REGIONS
+from config import SSO_PROFILE, REGIONS, ASSUME_ROLE_NAME, MAX_CONCURRENT_ACCOUNTS, MAX_CONCURRENT_REGIONS, DISCOVERY_ENGINE, VERIFY_TAGS_AFTER_TAGGING, AUTO_DISCOVER_REGIONS
 
 sys.stdin = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
 
@@ -21,6 +24,14 @@ def main():
     sys.stdin = sys.__stdin__
     sys.stdout = sys.__stdout__
     sys.stderr = sys.__stderr__
+
+    parser = argparse.ArgumentParser(description='AWS resource discovery and tagging tool')
+    parser.add_argument('--refresh-org-tree', action='store_true',
+                        help='Ignore the cached organization tree and walk Organizations again (after OU/account changes)')
+    parser.add_argument('--auto-regions', action=argparse.BooleanOptionalAction, default=AUTO_DISCOVER_REGIONS,
+                        help='Scan every enabled region that has an AWS Config recorder in each account instead of only REGIONS '
+                             '(the first of REGIONS is used to list regions and as the default global resource home region)')
+    args = parser.parse_args()
     setup_logging()
 
     session = boto3.Session(profile_name=SSO_PROFILE)
@@ -33,10 +44,10 @@ def main():
 선택: """).strip()
 
     if search_option in ['1', '2', '3']:
-        org_client = session.client('organizations')
+        org_tree = load_org_tree(session, refresh=args.refresh_org_tree)
         
         if search_option == '1':
-            all_accounts = get_all_accounts(org_client)
+            all_accounts = list_accounts(org_tree)
             print("사용 가능한 AWS 계정:")
             for i, (account_id, account_name) in enumerate(all_accounts, 1):
                 print(f"{i}. {account_id} - {account_name}")
@@ -49,7 +60,7 @@ def main():
             logging.info(f"Selected accounts: {account_ids}")
 
         elif search_option == '2':
-            all_ous = get_all_ou_ids(org_client)
+            all_ous = list_ous(org_tree)
             print("사용 가능한 AWS OU:")
             for i, (ou_id, ou_name) in enumerate(all_ous, 1):
                 print(f"{i}. {ou_id} - {ou_name}")
@@ -62,19 +73,33 @@ def main():
             logging.info(f"Selected OUs: {ou_ids}")
 
         else:  # search_option == '3'
-            ou_ids = get_all_ou_ids(org_client)
-            account_ids = get_all_accounts(org_client)
+            ou_ids = None
+            account_ids = [account[0] for account in list_accounts(org_tree)]
 
         try:
-            resources, accounts_with_many_resources = get_all_resources(
-                session=session, 
-                regions=REGIONS, 
-                assume_role_name=ASSUME_ROLE_NAME, 
-                max_concurrent_accounts=MAX_CONCURRENT_ACCOUNTS, 
-                max_concurrent_regions=MAX_CONCURRENT_REGIONS,
-                account_ids=account_ids,
-                ou_ids=ou_ids
-            )
+            if DISCOVERY_ENGINE == 'asyncio':
+                from async_discovery import get_all_resources_with_asyncio
+                resources, accounts_with_many_resources = get_all_resources_with_asyncio(
+                    session=session,
+                    regions=REGIONS,
+                    assume_role_name=ASSUME_ROLE_NAME,
+                    account_ids=account_ids,
+                    ou_ids=ou_ids,
+                    org_tree=org_tree,
+                    auto_regions=args.auto_regions
+                )
+            else:
+                resources, accounts_with_many_resources = get_all_resources(
+                    session=session, 
+                    regions=REGIONS, 
+                    assume_role_name=ASSUME_ROLE_NAME, 
+                    max_concurrent_accounts=MAX_CONCURRENT_ACCOUNTS, 
+                    max_concurrent_regions=MAX_CONCURRENT_REGIONS,
+                    account_ids=account_ids,
+                    ou_ids=ou_ids,
+                    org_tree=org_tree,
+                    auto_regions=args.auto_regions
+                )
             logging.info(f"Retrieved {len(resources)} resources in total")
         except Exception as e:
             logging.error(f"Error occurred while getting resources: {str(e)}")
@@ -126,13 +151,13 @@ def main():
             arn_filter = safe_input("ARN 필터를 입력하세요 (예: dev-hermes-bill-service, 입력하지 않으면 모든 ARN 대상): ").strip() or None
 
             if action == '1':
-                tagged_resources = add_tags(session, resources, account_id, region, resource_type, arn_filter)
+                tagged_resources = add_tags(session, resources, account_id, region, resource_type, arn_filter, verify=VERIFY_TAGS_AFTER_TAGGING)
             elif action == '2':
-                tagged_resources = remove_tags(session, resources, account_id, region, resource_type, arn_filter)
+                tagged_resources = remove_tags(session, resources, account_id, region, resource_type, arn_filter, verify=VERIFY_TAGS_AFTER_TAGGING)
             elif action == '3':
-                tagged_resources = add_tags_from_csv(session, resources, account_id, region, resource_type, arn_filter)
+                tagged_resources = add_tags_from_csv(session, resources, account_id, region, resource_type, arn_filter, verify=VERIFY_TAGS_AFTER_TAGGING)
             elif action == '4':
-                tagged_resources = remove_tags_from_csv(session, resources, account_id, region, resource_type, arn_filter)
+                tagged_resources = remove_tags_from_csv(session, resources, account_id, region, resource_type, arn_filter, verify=VERIFY_TAGS_AFTER_TAGGING)
 
             if tagged_resources:
                 update_csv = safe_input("원본 CSV 파일을 업데이트하시겠습니까? (y/n): ").lower()
@@ -158,9 +183,9 @@ def main():
                     continue
 
                 if action == '1':
-                    tagged_resources = add_tags(session, selected_resources)
+                    tagged_resources = add_tags(session, selected_resources, verify=VERIFY_TAGS_AFTER_TAGGING)
                 elif action == '2':
-                    tagged_resources = remove_tags(session, selected_resources)
+                    tagged_resources = remove_tags(session, selected_resources, verify=VERIFY_TAGS_AFTER_TAGGING)
 
             if tagged_resources:
                 logging.info(f"태그가 변경된 리소스 수: {len(tagged_resources)}")
@@ -216,9 +241,9 @@ def main():
             arn_filter = safe_input("ARN 필터를 입력하세요 (예: dev-hermes-bill-service, 입력하지 않으면 모든 ARN 대상): ").strip() or None
 
             if action == '3':
-                tagged_resources = add_tags_from_csv(session, resources, account_id, region, resource_type, arn_filter)
+                tagged_resources = add_tags_from_csv(session, resources, account_id, region, resource_type, arn_filter, verify=VERIFY_TAGS_AFTER_TAGGING)
             elif action == '4':
-                tagged_resources = remove_tags_from_csv(session, resources, account_id, region, resource_type, arn_filter)
+                tagged_resources = remove_tags_from_csv(session, resources, account_id, region, resource_type, arn_filter, verify=VERIFY_TAGS_AFTER_TAGGING)
 
             if tagged_resources:
                 update_csv = safe_input("원본 CSV 파일을 업데이트하시겠습니까? (y/n): ").lower()
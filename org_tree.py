@@ -0,0 +1,111 @@
+# org_tree.py
+# Organizations 의 OU 트리와 계정 목록을 너비 우선으로 병렬 탐색하고, 결과를 디스크에 TTL 캐시로 저장
+import concurrent.futures
+import logging
+import time
+from typing import List, Dict, Tuple
+
+import botocore
+
+from config import ORG_TREE_CACHE_DIR, ORG_TREE_CACHE_TTL, ORG_WALK_MAX_WORKERS, MAX_RETRIES
+from utils import exponential_backoff, read_json_cache, write_json_cache
+
+ORGANIZATIONS_THROTTLING_ERROR_CODES = {'TooManyRequestsException', 'ThrottlingException'}
+
+def _list_all(org_client, operation: str, result_key: str, max_retries=MAX_RETRIES, **kwargs) -> List[Dict]:
+    # Organizations 는 요청 한도가 낮으므로 병렬 탐색 중 쓰로틀링되면 해당 페이지만 백오프 후 다시 요청한다
+    method = getattr(org_client, operation)
+    items = []
+    retry = 0
+    while True:
+        try:
+            response = method(**kwargs)
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] not in ORGANIZATIONS_THROTTLING_ERROR_CODES or retry == max_retries - 1:
+                raise
+            sleep_time = exponential_backoff(retry)
+            logging.warning(f"Organizations throttling on {operation}. Retrying in {sleep_time:.2f} seconds...")
+            time.sleep(sleep_time)
+            retry += 1
+            continue
+        retry = 0
+        items.extend(response[result_key])
+        if not response.get('NextToken'):
+            return items
+        kwargs['NextToken'] = response['NextToken']
+
+def _list_children(org_client, parent_id) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    child_ous = [
+        (ou['Id'], ou['Name'])
+        for ou in _list_all(org_client, 'list_organizational_units_for_parent', 'OrganizationalUnits', ParentId=parent_id)
+    ]
+    accounts = [
+        (account['Id'], account['Name'])
+        for account in _list_all(org_client, 'list_accounts_for_parent', 'Accounts', ParentId=parent_id)
+        if account['Status'] == 'ACTIVE'
+    ]
+    return child_ous, accounts
+
+def walk_organization(org_client, max_workers=ORG_WALK_MAX_WORKERS) -> Dict:
+    """루트부터 한 레벨씩 내려가며, 같은 레벨의 OU 들은 동시에 조회한다.
+
+    반환값은 JSON 으로 그대로 저장할 수 있는 형태:
+    {'roots': [root_id], 'ous': {ou_id: name}, 'children': {parent_id: [ou_id]}, 'accounts': {parent_id: [[account_id, name]]}}
+    """
+    roots = [root['Id'] for root in _list_all(org_client, 'list_roots', 'Roots')]
+
+    tree = {'roots': roots, 'ous': {}, 'children': {}, 'accounts': {}}
+    level = list(roots)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while level:
+            future_to_parent = {executor.submit(_list_children, org_client, parent_id): parent_id for parent_id in level}
+            next_level = []
+            # 레벨 내 순서를 API 응답 순서대로 유지하기 위해 제출 순서대로 결과를 모은다
+            for future, parent_id in future_to_parent.items():
+                child_ous, accounts = future.result()
+                tree['children'][parent_id] = [ou_id for ou_id, _ in child_ous]
+                tree['accounts'][parent_id] = [list(account) for account in accounts]
+                for ou_id, ou_name in child_ous:
+                    tree['ous'][ou_id] = ou_name
+                    next_level.append(ou_id)
+            level = next_level
+
+    logging.info(f"Organization tree loaded: {len(tree['ous'])} OUs, {len(list_accounts(tree))} accounts")
+    return tree
+
+def load_org_tree(session, refresh=False, cache_dir=ORG_TREE_CACHE_DIR, ttl=ORG_TREE_CACHE_TTL) -> Dict:
+    cache_key = session.profile_name or 'default'
+    if not refresh:
+        tree = read_json_cache(cache_dir, cache_key, ttl)
+        if tree is not None:
+            logging.info(f"Using cached organization tree from '{cache_dir}'")
+            return tree
+
+    tree = walk_organization(session.client('organizations'))
+    write_json_cache(cache_dir, cache_key, tree)
+    return tree
+
+def list_ous(tree: Dict) -> List[Tuple[str, str]]:
+    # 기존 get_child_ous 와 같은 깊이 우선(전위) 순서로 나열
+    ous = []
+    stack = list(reversed(tree['roots']))
+    while stack:
+        parent_id = stack.pop()
+        children = tree['children'].get(parent_id, [])
+        if parent_id in tree['ous']:
+            ous.append((parent_id, tree['ous'][parent_id]))
+        stack.extend(reversed(children))
+    return ous
+
+def list_accounts(tree: Dict) -> List[Tuple[str, str]]:
+    accounts = {}
+    for parent_accounts in tree['accounts'].values():
+        for account_id, account_name in parent_accounts:
+            accounts[account_id] = account_name
+    return sorted(accounts.items())
+
+def accounts_in_ous(tree: Dict, ou_ids: List[str]) -> List[str]:
+    accounts = set()
+    for ou_id in ou_ids:
+        accounts.update(account_id for account_id, _ in tree['accounts'].get(ou_id, []))
+    return sorted(accounts)
@@ -0,0 +1,66 @@
+# progress.py
+# 리소스 단위 출력 대신, 일정 주기로 처리량과 예상 남은 시간을 집계해서 보여주는 진행률 리포터
+import logging
+import threading
+import time
+
+from config import PROGRESS_REPORT_INTERVAL
+
+
+class ProgressReporter:
+    """여러 워커 스레드가 advance() 로 처리 건수를 올리면, 백그라운드 스레드가 interval 마다 한 줄로 요약한다.
+
+    전체 건수는 미리 알 수 없으므로 계정/리전별 get_discovered_resource_counts 결과가 나올 때마다 add_total() 로 늘린다.
+    """
+
+    def __init__(self, label: str, total: int = 0, interval: float = PROGRESS_REPORT_INTERVAL):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_time = None
+
+    def add_total(self, count: int) -> None:
+        with self._lock:
+            self.total += count
+
+    def advance(self, count: int = 1) -> None:
+        with self._lock:
+            self.done += count
+
+    def start(self) -> 'ProgressReporter':
+        self._start_time = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f"progress-{self.label}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.report()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def report(self) -> None:
+        with self._lock:
+            done, total = self.done, self.total
+        elapsed = time.monotonic() - self._start_time if self._start_time else 0
+        rate = done / elapsed if elapsed else 0.0
+        if total:
+            percent = f"{done / total * 100:.1f}%"
+            eta = f"{(total - done) / rate:.0f}s" if rate and total > done else '-'
+        else:
+            percent, eta = '-', '-'
+        logging.info(f"[{self.label}] {done}/{total} ({percent}), {rate:.1f}/s, ETA {eta}")
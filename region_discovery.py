@@ -0,0 +1,78 @@
+# region_discovery.py
+# 계정별로 활성화된(옵트인된) 리전을 조회하고, 각 리전에 Config 레코더가 있는지 동시에 확인해 TTL 캐시로 보관
+# 결과는 {리전: Config 사용 여부} 형태이며, 리소스 검색은 True 인 계정/리전만 작업으로 만든다
+import concurrent.futures
+import logging
+from typing import List, Dict, Tuple
+
+from circuit_breaker import ACCOUNT_ERROR_CODES, get_error_code
+from config import (
+    REGION_AVAILABILITY_CACHE_DIR, REGION_AVAILABILITY_CACHE_TTL, REGION_PROBE_MAX_WORKERS,
+)
+from utils import read_json_cache, write_json_cache
+
+# 다시 시도해도 결과가 같은 오류 (리전 비활성화, SCP 로 리전 차단 등). 이 오류로 끝난 리전은 사용 불가로 캐시한다
+REGION_UNAVAILABLE_ERROR_CODES = ACCOUNT_ERROR_CODES | {'UnrecognizedClientException', 'InvalidClientTokenId', 'AuthFailure'}
+
+def enabled_region_names(response: Dict) -> List[str]:
+    # DescribeRegions 는 AllRegions 를 지정하지 않으면 옵트인이 필요 없는 리전과 옵트인된 리전만 돌려준다
+    return sorted(region['RegionName'] for region in response['Regions'])
+
+def record_probe_result(availability: Dict[str, bool], account_id: str, region: str, result) -> bool:
+    """probe 결과(bool 또는 예외)를 availability 에 기록하고, 캐시해도 되는 결과이면 True."""
+    if not isinstance(result, Exception):
+        availability[region] = result
+        return True
+    availability[region] = False
+    if get_error_code(result) in REGION_UNAVAILABLE_ERROR_CODES:
+        logging.debug(f"Region {region} is not available in account {account_id}: {str(result)}")
+        return True
+    logging.warning(f"Error probing AWS Config in account {account_id}, region {region}: {str(result)}")
+    return False
+
+def probe_config_recorder(session_cache, account_id: str, region: str) -> bool:
+    config_client = session_cache.client('config', account_id, region)
+    response = config_client.describe_configuration_recorder_status()
+    return bool(response['ConfigurationRecordersStatus'])
+
+def probe_regions(session_cache, account_id: str, regions: List[str],
+                  max_workers: int = REGION_PROBE_MAX_WORKERS) -> Tuple[Dict[str, bool], bool]:
+    """(리전별 Config 사용 여부, 캐시해도 되는지). 일시적인 오류가 있었던 결과는 캐시하지 않는다.
+
+    클라이언트는 AssumedSessionCache 에서 받으므로 (생성은 락 안에서) 여러 스레드가 같은 계정 세션을 공유해도 안전하다.
+    """
+    availability = {}
+    complete = True
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_region = {executor.submit(probe_config_recorder, session_cache, account_id, region): region for region in regions}
+        for future in concurrent.futures.as_completed(future_to_region):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = e
+            complete = record_probe_result(availability, account_id, future_to_region[future], result) and complete
+    return dict(sorted(availability.items())), complete
+
+def read_region_availability(account_id: str, cache_dir=REGION_AVAILABILITY_CACHE_DIR, ttl=REGION_AVAILABILITY_CACHE_TTL):
+    return read_json_cache(cache_dir, str(account_id), ttl)
+
+def save_region_availability(account_id: str, availability: Dict[str, bool], complete: bool, cache_dir=REGION_AVAILABILITY_CACHE_DIR) -> None:
+    if complete:
+        write_json_cache(cache_dir, str(account_id), availability)
+    live = live_regions(availability)
+    logging.info(f"Account {account_id}: AWS Config enabled in {len(live)}/{len(availability)} regions")
+
+def get_region_availability(session_cache, account_id: str, base_region: str, refresh=False,
+                            cache_dir=REGION_AVAILABILITY_CACHE_DIR, ttl=REGION_AVAILABILITY_CACHE_TTL) -> Dict[str, bool]:
+    if not refresh:
+        availability = read_region_availability(account_id, cache_dir, ttl)
+        if availability is not None:
+            return availability
+
+    regions = enabled_region_names(session_cache.client('ec2', account_id, base_region).describe_regions())
+    availability, complete = probe_regions(session_cache, account_id, regions)
+    save_region_availability(account_id, availability, complete, cache_dir)
+    return availability
+
+def live_regions(availability: Dict[str, bool]) -> List[str]:
+    return sorted(region for region, enabled in availability.items() if enabled)
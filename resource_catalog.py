@@ -0,0 +1,46 @@
+# resource_catalog.py
+# 계정/리전별로 AWS Config 가 기록 중인 리소스 타입과 개수를 조회하고 TTL 캐시로 보관
+import logging
+from typing import Dict, Optional
+
+from config import RESOURCE_CATALOG_CACHE_DIR, RESOURCE_CATALOG_CACHE_TTL
+from utils import read_json_cache, write_json_cache
+
+def fetch_discovered_resource_counts(session, region: str, check_recorder=True) -> Optional[Dict[str, int]]:
+    # Config 가 꺼져 있으면 None, 켜져 있으면 nextToken 을 끝까지 따라가 개수가 0 보다 큰 타입만 돌려준다
+    # (region_discovery 로 레코더를 이미 확인한 리전은 check_recorder=False 로 확인 호출을 생략)
+    config_client = session.client('config', region_name=region)
+    if check_recorder:
+        response = config_client.describe_configuration_recorder_status()
+        if not response['ConfigurationRecordersStatus']:
+            return None
+
+    resource_counts = {}
+    kwargs = {}
+    while True:
+        response = config_client.get_discovered_resource_counts(**kwargs)
+        for item in response['resourceCounts']:
+            if item['count'] > 0:
+                resource_counts[item['resourceType']] = item['count']
+        if not response.get('nextToken'):
+            break
+        kwargs['nextToken'] = response['nextToken']
+    return resource_counts
+
+def catalog_cache_key(account_id: str, region: str) -> str:
+    return f"{account_id}:{region}"
+
+def get_resource_catalog(session, account_id: str, region: str, refresh=False,
+                         cache_dir=RESOURCE_CATALOG_CACHE_DIR, ttl=RESOURCE_CATALOG_CACHE_TTL, check_recorder=True) -> Dict[str, int]:
+    cache_key = catalog_cache_key(account_id, region)
+    if not refresh:
+        resource_counts = read_json_cache(cache_dir, cache_key, ttl)
+        if resource_counts is not None:
+            return resource_counts
+
+    resource_counts = fetch_discovered_resource_counts(session, region, check_recorder)
+    if resource_counts is None:
+        logging.warning(f"AWS Config is not enabled in account {account_id}, region {region}.")
+        resource_counts = {}
+    write_json_cache(cache_dir, cache_key, resource_counts)
+    return resource_counts
@@ -0,0 +1,81 @@
+# session_cache.py
+# 계정별 AssumeRole 세션과 클라이언트를 자격 증명 만료 직전까지 재사용하는 캐시 (리소스 검색, 태깅, 태깅 서비스에서 공용)
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import boto3
+
+from config import ASSUME_ROLE_NAME, SESSION_REFRESH_MARGIN
+
+
+class AssumedSessionCache:
+    """계정별로 AssumeRole 결과 세션과 클라이언트를 자격 증명 만료 직전까지 재사용한다.
+
+    boto3 Session 의 client() 생성은 스레드 안전하지 않으므로 생성은 락 안에서 하고, 만들어진 클라이언트는 여러 스레드에서 공유한다.
+    여러 스레드가 같은 계정을 다룰 때는 get_session() 결과로 직접 클라이언트를 만들지 말고 client() 를 사용한다.
+    """
+
+    def __init__(self, session, role_name: str = ASSUME_ROLE_NAME, refresh_margin: int = SESSION_REFRESH_MARGIN):
+        self.session = session
+        self.role_name = role_name
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self._lock = threading.Lock()
+        self._sts_client = None
+        self._sessions = {}  # account_id -> (boto3.Session, 만료 시각)
+        self._account_locks = defaultdict(threading.Lock)
+        self._clients = {}  # (service, account_id, region) -> (client, 만료 시각)
+
+    def _valid(self, expiration) -> bool:
+        return expiration is None or datetime.now(timezone.utc) + self.refresh_margin < expiration
+
+    def _get_sts_client(self):
+        with self._lock:
+            if self._sts_client is None:
+                self._sts_client = self.session.client('sts')
+            return self._sts_client
+
+    def _get_entry(self, account_id: str):
+        # 같은 계정에 대한 AssumeRole 만 직렬화하고, 다른 계정은 동시에 진행되도록 계정별 락을 사용
+        with self._lock:
+            account_lock = self._account_locks[account_id]
+        with account_lock:
+            with self._lock:
+                entry = self._sessions.get(account_id)
+            if entry and self._valid(entry[1]):
+                return entry
+            entry = assume_role_with_expiration(self.session, account_id, self.role_name, self._get_sts_client())
+            with self._lock:
+                self._sessions[account_id] = entry
+            return entry
+
+    def get_session(self, account_id: str):
+        return self._get_entry(str(account_id))[0]
+
+    def client(self, service: str, account_id: str, region: str):
+        account_id = str(account_id)
+        key = (service, account_id, region)
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry and self._valid(entry[1]):
+                return entry[0]
+        assumed_session, expiration = self._get_entry(account_id)
+        with self._lock:
+            client = assumed_session.client(service, region_name=region)
+            self._clients[key] = (client, expiration)
+            return client
+
+
+def assume_role_with_expiration(session, account_id, role_name, sts_client=None):
+    sts_client = sts_client or session.client('sts')
+    assumed_role_object = sts_client.assume_role(
+        RoleArn=f"arn:aws:iam::{account_id}:role/{role_name}",
+        RoleSessionName="AssumeRoleSession1"
+    )
+    credentials = assumed_role_object['Credentials']
+    assumed_session = boto3.Session(
+        aws_access_key_id=credentials['AccessKeyId'],
+        aws_secret_access_key=credentials['SecretAccessKey'],
+        aws_session_token=credentials['SessionToken'],
+    )
+    return assumed_session, credentials.get('Expiration')
@@ -0,0 +1,187 @@
+# sharded_discovery.py
+# 대상 계정을 안정적인 해시로 K 개 샤드에 나누어 여러 프로세스(또는 여러 호스트)에서 검색하고, 샤드별 결과를 병합
+# 로컬 프로세스:  python sharded_discovery.py run --shards 4
+# 여러 호스트:    (호스트 i 에서) python sharded_discovery.py shard --index i --count K
+#                 (결과 수집 후)  python sharded_discovery.py merge shards/*.csv -o aws_resources_merged.csv
+import argparse
+import concurrent.futures
+import csv
+import glob
+import hashlib
+import heapq
+import logging
+import multiprocessing
+import os
+import re
+import sys
+from typing import List, Dict
+
+import boto3
+
+from aws_config_explorer import get_all_resources
+from config import SSO_PROFILE, REGIONS, ASSUME_ROLE_NAME, MAX_CONCURRENT_ACCOUNTS, MAX_CONCURRENT_REGIONS, AUTO_DISCOVER_REGIONS
+from csv_operations import RESOURCE_FIELDNAMES, save_to_csv
+from logging_config import setup_logging
+from org_tree import load_org_tree, list_accounts, accounts_in_ous
+
+def resource_sort_key(resource: Dict):
+    # 샤드 수나 완료 순서와 상관없이 같은 결과 파일이 나오도록 하는 정렬 기준
+    return (resource['Account ID'], resource['Region'], resource['Resource Type'], resource['ARN'])
+
+def shard_for_account(account_id: str, shard_count: int) -> int:
+    # hash() 는 프로세스마다 값이 달라지므로 호스트 간에도 동일한 sha1 을 사용
+    digest = hashlib.sha1(str(account_id).encode('utf-8')).hexdigest()
+    return int(digest, 16) % shard_count
+
+def select_shard_accounts(account_ids: List[str], shard_index: int, shard_count: int) -> List[str]:
+    return sorted(a for a in account_ids if shard_for_account(a, shard_count) == shard_index)
+
+SHARD_FILENAME_PATTERN = re.compile(r'shard-(\d{3})-of-(\d{3})\.csv$')
+
+def shard_filename(output_dir: str, shard_index: int, shard_count: int) -> str:
+    return os.path.join(output_dir, f"aws_resources.shard-{shard_index:03d}-of-{shard_count:03d}.csv")
+
+def check_shard_set(part_files: List[str]) -> None:
+    # 호스트 하나가 실패하거나 결과 파일이 빠지면 일부 계정만 담긴 인벤토리가 완전한 것처럼 만들어지므로 병합 전에 확인
+    shards = {}
+    for filename in part_files:
+        match = SHARD_FILENAME_PATTERN.search(os.path.basename(filename))
+        if not match:
+            raise ValueError(f"'{filename}' is not a shard file (expected *.shard-III-of-KKK.csv)")
+        shards.setdefault(int(match.group(2)), set()).add(int(match.group(1)))
+    if len(shards) != 1:
+        raise ValueError(f"Shard files come from different shard counts: {sorted(shards)}")
+    shard_count, indices = next(iter(shards.items()))
+    missing = sorted(set(range(shard_count)) - indices)
+    if missing:
+        raise ValueError(f"Missing shard files for indices {missing} of {shard_count}")
+
+def resolve_target_accounts(session, account_ids=None, ou_ids=None) -> List[str]:
+    if account_ids:
+        return sorted(set(account_ids))
+    org_tree = load_org_tree(session)
+    if ou_ids:
+        return accounts_in_ous(org_tree, ou_ids)
+    return [account[0] for account in list_accounts(org_tree)]
+
+def run_shard(account_ids: List[str], shard_index: int, shard_count: int, output_dir: str,
+              profile: str = SSO_PROFILE, regions: List[str] = REGIONS, auto_regions: bool = AUTO_DISCOVER_REGIONS) -> str:
+    # 검색이 실패하면 (ex: 만료된 SSO 자격 증명) 빈 샤드 파일을 남기지 않고 예외를 그대로 올려서, 병합이 빠진 샤드로 거부되게 한다
+    shard_accounts = select_shard_accounts(account_ids, shard_index, shard_count)
+    filename = shard_filename(output_dir, shard_index, shard_count)
+    logging.info(f"Shard {shard_index}/{shard_count}: {len(shard_accounts)} accounts -> {filename}")
+    # 이전 실행의 같은 이름 샤드 파일이 남아 있으면 이번 실행이 실패해도 병합되므로 먼저 지운다
+    if os.path.exists(filename):
+        os.remove(filename)
+
+    resources = []
+    if shard_accounts:
+        session = boto3.Session(profile_name=profile)
+        resources, _ = get_all_resources(
+            session=session,
+            regions=regions,
+            assume_role_name=ASSUME_ROLE_NAME,
+            max_concurrent_accounts=MAX_CONCURRENT_ACCOUNTS,
+            max_concurrent_regions=MAX_CONCURRENT_REGIONS,
+            account_ids=shard_accounts,
+            auto_regions=auto_regions,
+            strict=True
+        )
+
+    os.makedirs(output_dir, exist_ok=True)
+    save_to_csv(sorted(resources, key=resource_sort_key), filename)
+    return filename
+
+def run_local_shards(account_ids: List[str], shard_count: int, output_dir: str,
+                     profile: str = SSO_PROFILE, regions: List[str] = REGIONS, auto_regions: bool = AUTO_DISCOVER_REGIONS) -> List[str]:
+    # fork 를 쓰면 로깅 리스너 스레드가 자식 프로세스로 복사되지 않으므로 spawn 으로 띄우고 각자 로깅을 설정
+    # .tagtool_cache 는 key 마다 별도 파일을 원자적으로 교체하므로 여러 프로세스가 동시에 써도 항목이 사라지지 않는다
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=shard_count, mp_context=context, initializer=setup_logging) as executor:
+        futures = [
+            executor.submit(run_shard, account_ids, shard_index, shard_count, output_dir, profile, regions, auto_regions)
+            for shard_index in range(shard_count)
+        ]
+        return [future.result() for future in futures]
+
+def _read_sorted_rows(filename: str):
+    with open(filename, 'r', newline='', encoding='utf-8') as csvfile:
+        yield from csv.DictReader(csvfile)
+
+def merge_shards(part_files: List[str], output_filename: str, allow_partial: bool = False) -> int:
+    """샤드 파일들은 resource_sort_key 로 정렬되어 있으므로 k-way 병합으로 스트리밍하며 ARN 중복을 제거한다."""
+    if allow_partial:
+        try:
+            check_shard_set(part_files)
+        except ValueError as e:
+            logging.warning(f"Merging an incomplete shard set: {str(e)}")
+    else:
+        check_shard_set(part_files)
+    seen_arns = set()
+    written = 0
+    with open(output_filename, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=RESOURCE_FIELDNAMES, extrasaction='ignore')
+        writer.writeheader()
+        for row in heapq.merge(*(_read_sorted_rows(f) for f in sorted(part_files)), key=resource_sort_key):
+            if row['ARN'] and row['ARN'] in seen_arns:
+                continue
+            seen_arns.add(row['ARN'])
+            writer.writerow(row)
+            written += 1
+    logging.info(f"Merged {len(part_files)} shard files into '{output_filename}' ({written} resources)")
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description='Sharded multi-process / multi-host resource discovery')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_target_arguments(subparser):
+        subparser.add_argument('--profile', default=SSO_PROFILE, help='AWS profile name')
+        subparser.add_argument('--regions', nargs='+', default=REGIONS, help='Regions to scan')
+        subparser.add_argument('--auto-regions', action=argparse.BooleanOptionalAction, default=AUTO_DISCOVER_REGIONS,
+                               help='Scan every enabled region with an AWS Config recorder in each account instead of --regions')
+        subparser.add_argument('--accounts', nargs='+', help='Target account IDs (default: all accounts)')
+        subparser.add_argument('--ous', nargs='+', help='Target OU IDs')
+        subparser.add_argument('--output-dir', default='shards', help='Directory for shard files')
+
+    run_parser = subparsers.add_parser('run', help='Run all shards as local worker processes and merge')
+    add_target_arguments(run_parser)
+    run_parser.add_argument('--shards', type=int, default=os.cpu_count(), help='Number of worker processes')
+    run_parser.add_argument('-o', '--output', default='aws_resources_merged.csv', help='Merged output file')
+
+    shard_parser = subparsers.add_parser('shard', help='Run a single shard (one per host)')
+    add_target_arguments(shard_parser)
+    shard_parser.add_argument('--index', type=int, required=True, help='Shard index (0-based)')
+    shard_parser.add_argument('--count', type=int, required=True, help='Total number of shards')
+
+    merge_parser = subparsers.add_parser('merge', help='Merge shard files')
+    merge_parser.add_argument('parts', nargs='+', help='Shard files or glob patterns')
+    merge_parser.add_argument('-o', '--output', default='aws_resources_merged.csv', help='Merged output file')
+    merge_parser.add_argument('--allow-partial', action='store_true', help='Merge even if some shard files are missing')
+
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.command == 'merge':
+        part_files = sorted({f for pattern in args.parts for f in glob.glob(pattern)})
+        try:
+            merge_shards(part_files, args.output, args.allow_partial)
+        except ValueError as e:
+            parser.error(str(e))
+        return
+
+    session = boto3.Session(profile_name=args.profile)
+    account_ids = resolve_target_accounts(session, args.accounts, args.ous)
+
+    try:
+        if args.command == 'shard':
+            run_shard(account_ids, args.index, args.count, args.output_dir, args.profile, args.regions, args.auto_regions)
+        else:
+            part_files = run_local_shards(account_ids, args.shards, args.output_dir, args.profile, args.regions, args.auto_regions)
+            merge_shards(part_files, args.output)
+    except RuntimeError as e:
+        logging.error(f"Shard discovery failed: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,46 @@
 # tagging_operations.py
 # 실제 태깅 하는 기능을 정의
-import boto3
-import botocore
 import logging
-import traceback
 import sys
 import io
+import time
+import concurrent.futures
+from collections import defaultdict
 from typing import List, Dict
-from utils import safe_input
+from utils import safe_input, parse_tags
+from circuit_breaker import CircuitBreaker
+from config import (GLOBAL_TAGGING_REGION, VERIFY_BATCH_SIZE, VERIFY_MAX_RETRIES, INITIAL_BACKOFF, MAX_BACKOFF,
+                    MAX_CONCURRENT_ACCOUNTS)
+from session_cache import AssumedSessionCache, assume_role_with_expiration
 
 
 sys.stdin = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
 
-def add_tags(session, selected_resources: List[Dict], account_id: str = None, region: str = None, resource_type: str = None, arn_filter: str = None) -> List[Dict]:
+def add_tags(session, selected_resources: List[Dict], account_id: str = None, region: str = None, resource_type: str = None, arn_filter: str = None, breaker=None, verify: bool = False, session_cache=None) -> List[Dict]:
     tag_key = safe_input("추가할 태그 키를 입력하세요: ").strip()
     tag_value = safe_input("추가할 태그 값을 입력하세요 (빈 값도 가능): ").strip()
     if not tag_key:
         logging.error("태그 키는 비어있을 수 없습니다.")
         return []
 
+    breaker = breaker or CircuitBreaker()
+    session_cache = session_cache or AssumedSessionCache(session)
     tagged_resources = []
     for resource in selected_resources:
         if ((account_id is None or resource['Account ID'] == account_id) and 
             (region is None or resource['Region'] == region) and 
             (resource_type is None or resource['Resource Type'] == resource_type) and
             (arn_filter is None or arn_filter in resource['ARN'])):
+            if breaker.is_blocked(resource['Account ID']):
+                breaker.skip(resource['Account ID'])
+                continue
             try:
-                assumed_session = assume_role(session, resource['Account ID'], "OrganizationAccountAccessRole")
-                client = assumed_session.client('resourcegroupstaggingapi', region_name=resource['Region'])
+                client = session_cache.client('resourcegroupstaggingapi', resource['Account ID'], resolve_tagging_region(resource['Region']))
                 response = client.tag_resources(
                     ResourceARNList=[resource['ARN']],
                     Tags={tag_key: tag_value}
                 )
+                breaker.record_success(resource['Account ID'])
                 if response.get('FailedResourcesMap'):
                     logging.error(f"리소스 {resource['ARN']}에 태그 추가 실패: {response['FailedResourcesMap']}")
                 else:
@@ -40,28 +49,37 @@ def add_tags(session, selected_resources: List[Dict], account_id: str = None, re
                     resource['Tags'][tag_key] = tag_value
                     tagged_resources.append(resource)
             except Exception as e:
+                breaker.record_error(resource['Account ID'], None, e)
                 logging.error(f"리소스 {resource['ARN']}에 태그 추가 중 오류 발생: {str(e)}")
 
     logging.info(f"총 {len(tagged_resources)}개의 리소스에 태그가 추가되었습니다.")
+    if verify and tagged_resources:
+        tagged_resources = verify_tagged_resources(session, tagged_resources, tag_key, tag_value, breaker=breaker, session_cache=session_cache)
+    breaker.log_report()
     return tagged_resources
 
 
-def remove_tags(session, selected_resources: List[Dict], account_id: str = None, region: str = None, resource_type: str = None, arn_filter: str = None) -> List[Dict]:
+def remove_tags(session, selected_resources: List[Dict], account_id: str = None, region: str = None, resource_type: str = None, arn_filter: str = None, breaker=None, verify: bool = False, session_cache=None) -> List[Dict]:
     tag_key = safe_input("삭제할 태그 키를 입력하세요: ")
 
+    breaker = breaker or CircuitBreaker()
+    session_cache = session_cache or AssumedSessionCache(session)
     tagged_resources = []
     for resource in selected_resources:
         if ((account_id is None or resource['Account ID'] == account_id) and 
             (region is None or resource['Region'] == region) and 
             (resource_type is None or resource['Resource Type'] == resource_type) and
             (arn_filter is None or arn_filter in resource['ARN'])):
+            if breaker.is_blocked(resource['Account ID']):
+                breaker.skip(resource['Account ID'])
+                continue
             try:
-                assumed_session = assume_role(session, resource['Account ID'], "OrganizationAccountAccessRole")
-                client = assumed_session.client('resourcegroupstaggingapi', region_name=resource['Region'])
+                client = session_cache.client('resourcegroupstaggingapi', resource['Account ID'], resolve_tagging_region(resource['Region']))
                 response = client.untag_resources(
                     ResourceARNList=[resource['ARN']],
                     TagKeys=[tag_key]
                 )
+                breaker.record_success(resource['Account ID'])
                 if response['FailedResourcesMap']:
                     logging.error(f"리소스 {resource['ARN']}에서 태그 삭제 실패: {response['FailedResourcesMap']}")
                 else:
@@ -71,17 +89,23 @@ def remove_tags(session, selected_resources: List[Dict], account_id: str = None,
                         del resource['Tags'][tag_key]
                     tagged_resources.append(resource)
             except Exception as e:
+                breaker.record_error(resource['Account ID'], None, e)
                 logging.error(f"리소스 {resource['ARN']}에서 태그 삭제 중 오류 발생: {str(e)}")
 
+    if verify and tagged_resources:
+        tagged_resources = verify_tagged_resources(session, tagged_resources, tag_key, removed=True, breaker=breaker, session_cache=session_cache)
+    breaker.log_report()
     return tagged_resources
 
-def add_tags_from_csv(session, resources: List[Dict], account_id: str = None, region: str = None, resource_type: str = None, arn_filter: str = None) -> List[Dict]:
+def add_tags_from_csv(session, resources: List[Dict], account_id: str = None, region: str = None, resource_type: str = None, arn_filter: str = None, breaker=None, verify: bool = False, session_cache=None) -> List[Dict]:
     tag_key = safe_input("추가할 태그 키를 입력하세요: ").strip()
     tag_value = safe_input("추가할 태그 값을 입력하세요 (빈 값도 가능): ").strip()
     if not tag_key:
         logging.error("태그 키는 비어있을 수 없습니다.")
         return []
 
+    breaker = breaker or CircuitBreaker()
+    session_cache = session_cache or AssumedSessionCache(session)
     tagged_resources = []
     matching_resources = 0
     resources_to_tag = 0
@@ -105,13 +129,16 @@ def add_tags_from_csv(session, resources: List[Dict], account_id: str = None, re
             # 태그가 존재하지 않거나 다른 값을 가진 경우에만 추가
             if tag_key not in current_tags or current_tags[tag_key] != tag_value:
                 resources_to_tag += 1
+                if breaker.is_blocked(resource['Account ID']):
+                    breaker.skip(resource['Account ID'])
+                    continue
                 try:
-                    assumed_session = assume_role(session, resource['Account ID'], "OrganizationAccountAccessRole")
-                    client = assumed_session.client('resourcegroupstaggingapi', region_name=resource['Region'])
+                    client = session_cache.client('resourcegroupstaggingapi', resource['Account ID'], resolve_tagging_region(resource['Region']))
                     response = client.tag_resources(
                         ResourceARNList=[resource['ARN']],
                         Tags={tag_key: tag_value}
                     )
+                    breaker.record_success(resource['Account ID'])
                     if response.get('FailedResourcesMap'):
                         logging.error(f"리소스 {resource['ARN']}에 태그 추가 실패: {response['FailedResourcesMap']}")
                     else:
@@ -120,8 +147,9 @@ def add_tags_from_csv(session, resources: List[Dict], account_id: str = None, re
                         resource['Tags'] = current_tags  # 여기서 딕셔너리를 다시 할당
                         tagged_resources.append(resource)
                 except Exception as e:
+                    breaker.record_error(resource['Account ID'], None, e)
                     logging.error(f"리소스 {resource['ARN']}에 태그 추가 중 오류 발생: {str(e)}")
-                    logging.error(traceback.format_exc())
+                    logging.debug("오류 상세", exc_info=True)
 
     logging.info(f"총 {matching_resources}개의 리소스가 조건과 일치합니다.")
     logging.info(f"그 중 {resources_to_tag}개의 리소스에 태그를 추가해야 했습니다.")
@@ -132,11 +160,16 @@ def add_tags_from_csv(session, resources: List[Dict], account_id: str = None, re
     elif len(tagged_resources) == 0:
         logging.warning("일치하는 리소스가 있지만 태그 추가에 실패했습니다. 위의 오류 메시지를 확인해주세요.")
 
+    if verify and tagged_resources:
+        tagged_resources = verify_tagged_resources(session, tagged_resources, tag_key, tag_value, breaker=breaker, session_cache=session_cache)
+    breaker.log_report()
     return tagged_resources   
 
-def remove_tags_from_csv(session, resources: List[Dict], account_id: str = None, region: str = None, resource_type: str = None, arn_filter: str = None) -> List[Dict]:
+def remove_tags_from_csv(session, resources: List[Dict], account_id: str = None, region: str = None, resource_type: str = None, arn_filter: str = None, breaker=None, verify: bool = False, session_cache=None) -> List[Dict]:
     tag_key = safe_input("삭제할 태그 키를 입력하세요: ")
 
+    breaker = breaker or CircuitBreaker()
+    session_cache = session_cache or AssumedSessionCache(session)
     tagged_resources = []
     matching_resources = 0
     resources_with_tag = 0
@@ -159,13 +192,16 @@ def remove_tags_from_csv(session, resources: List[Dict], account_id: str = None,
             
             if tag_key in current_tags:
                 resources_with_tag += 1
+                if breaker.is_blocked(resource['Account ID']):
+                    breaker.skip(resource['Account ID'])
+                    continue
                 try:
-                    assumed_session = assume_role(session, resource['Account ID'], "OrganizationAccountAccessRole")
-                    client = assumed_session.client('resourcegroupstaggingapi', region_name=resource['Region'])
+                    client = session_cache.client('resourcegroupstaggingapi', resource['Account ID'], resolve_tagging_region(resource['Region']))
                     response = client.untag_resources(
                         ResourceARNList=[resource['ARN']],
                         TagKeys=[tag_key]
                     )
+                    breaker.record_success(resource['Account ID'])
                     if response['FailedResourcesMap']:
                         logging.error(f"리소스 {resource['ARN']}에서 태그 삭제 실패: {response['FailedResourcesMap']}")
                     else:
@@ -174,8 +210,9 @@ def remove_tags_from_csv(session, resources: List[Dict], account_id: str = None,
                         resource['Tags'] = current_tags
                         tagged_resources.append(resource)
                 except Exception as e:
+                    breaker.record_error(resource['Account ID'], None, e)
                     logging.error(f"리소스 {resource['ARN']}에서 태그 삭제 중 오류 발생: {str(e)}")
-                    logging.error(traceback.format_exc())
+                    logging.debug("오류 상세", exc_info=True)
 
     logging.info(f"총 {matching_resources}개의 리소스가 조건과 일치합니다.")
     logging.info(f"그 중 {resources_with_tag}개의 리소스에 삭제할 태그가 있었습니다.")
@@ -190,18 +227,181 @@ def remove_tags_from_csv(session, resources: List[Dict], account_id: str = None,
         logging.warning(warning_msg)
         print(warning_msg)  # 콘솔에 직접 출력
 
+    if verify and tagged_resources:
+        tagged_resources = verify_tagged_resources(session, tagged_resources, tag_key, removed=True, breaker=breaker, session_cache=session_cache)
+    breaker.log_report()
     return tagged_resources
 
 
+def _tag_state_matches(tags: Dict, tag_key: str, tag_value: str, removed: bool) -> bool:
+    if removed:
+        return tag_key not in tags
+    return tags.get(tag_key) == tag_value
+
+def _read_applied_tags(client, arns: List[str]) -> Dict[str, Dict]:
+    # Resource Groups Tagging API 가 돌려주지 않은 ARN 은 태그가 하나도 없는 것으로 간주
+    applied_tags = {arn: {} for arn in arns}
+    for start in range(0, len(arns), VERIFY_BATCH_SIZE):
+        kwargs = {'ResourceARNList': arns[start:start + VERIFY_BATCH_SIZE]}
+        while True:
+            response = client.get_resources(**kwargs)
+            for mapping in response['ResourceTagMappingList']:
+                applied_tags[mapping['ResourceARN']] = {tag['Key']: tag['Value'] for tag in mapping.get('Tags', [])}
+            if not response.get('PaginationToken'):
+                break
+            kwargs['PaginationToken'] = response['PaginationToken']
+    return applied_tags
+
+def _reapply_tags(client, arns: List[str], tag_key: str, tag_value: str, removed: bool) -> Dict[str, Dict]:
+    # TagResources/UntagResources 는 호출당 최대 20개 ARN. 실패한 ARN 의 FailedResourcesMap 항목을 모아 돌려준다
+    failed = {}
+    for start in range(0, len(arns), 20):
+        batch = arns[start:start + 20]
+        if removed:
+            response = client.untag_resources(ResourceARNList=batch, TagKeys=[tag_key])
+        else:
+            response = client.tag_resources(ResourceARNList=batch, Tags={tag_key: tag_value})
+        failed.update(response.get('FailedResourcesMap', {}))
+    return failed
+
+def verify_tagged_resources(session, tagged_resources: List[Dict], tag_key: str, tag_value: str = None, removed: bool = False,
+                            max_retries: int = VERIFY_MAX_RETRIES, breaker=None, session_cache=None) -> List[Dict]:
+    """태깅 API 가 성공을 돌려준 리소스의 실제 태그를 계정/리전별로 최대 100개씩 다시 읽어 확인한다.
+
+    기대한 상태가 아닌 리소스는 전파 지연일 수 있으므로 잠시 기다렸다가 다시 읽고, 그래도 다른 것만 태그를 다시 적용한다.
+    대기는 모든 계정/리전 그룹을 한 라운드로 묶어 라운드당 한 번만 하므로, 전체 시간이 그룹 수에 비례해 늘지 않는다.
+    확인된 리소스만 실제 태그로 갱신해서 돌려준다.
+    """
+    breaker = breaker or CircuitBreaker()
+    session_cache = session_cache or AssumedSessionCache(session)
+    groups = defaultdict(list)
+    for resource in tagged_resources:
+        groups[(resource['Account ID'], resolve_tagging_region(resource['Region']))].append(resource)
+
+    verified_resources = []
+    pending_groups = {}  # (account_id, region) -> (client, {ARN: 리소스})
+    for (account_id, region), resources in groups.items():
+        if breaker.is_blocked(account_id):
+            breaker.skip(account_id, count=len(resources))
+            continue
+        try:
+            client = session_cache.client('resourcegroupstaggingapi', account_id, region)
+        except Exception as e:
+            breaker.record_error(account_id, None, e)
+            logging.error(f"계정 {account_id}, 리전 {region}의 태그 검증 중 오류 발생: {str(e)}")
+            continue
+        pending_groups[(account_id, region)] = (client, {resource['ARN']: resource for resource in resources})
+
+    def for_each_pending_group(action):
+        # 오류가 난 그룹은 검증 대상에서 빼고, 다른 그룹은 계속 진행
+        for (account_id, region), (client, pending) in list(pending_groups.items()):
+            if not pending:
+                continue
+            try:
+                action(client, pending)
+            except Exception as e:
+                del pending_groups[(account_id, region)]
+                breaker.record_error(account_id, None, e)
+                logging.error(f"계정 {account_id}, 리전 {region}의 태그 검증 중 오류 발생: {str(e)}")
+                logging.debug("오류 상세", exc_info=True)
+
+    def read_pending(client, pending):
+        for arn, tags in _read_applied_tags(client, list(pending)).items():
+            if _tag_state_matches(tags, tag_key, tag_value, removed):
+                resource = pending.pop(arn)
+                resource['Tags'] = tags
+                verified_resources.append(resource)
+
+    def reapply_pending(client, pending):
+        for arn, failure in _reapply_tags(client, list(pending), tag_key, tag_value, removed).items():
+            pending.pop(arn, None)
+            logging.error(f"리소스 {arn}의 태그 재적용 실패: {failure.get('ErrorCode')} - {failure.get('ErrorMessage')}")
+
+    def has_pending():
+        return any(pending for _, pending in pending_groups.values())
+
+    for_each_pending_group(read_pending)
+    for attempt in range(1, max_retries + 1):
+        if not has_pending():
+            break
+        # 태그 전파가 늦는 경우를 위해 잠시 기다렸다가 다시 읽고, 여전히 다른 리소스에만 태그를 다시 적용
+        time.sleep(min(INITIAL_BACKOFF * 2 ** (attempt - 1), MAX_BACKOFF))
+        for_each_pending_group(read_pending)
+        if not has_pending() or attempt == max_retries:
+            break
+        for_each_pending_group(reapply_pending)
+
+    for (account_id, region), (client, pending) in pending_groups.items():
+        breaker.record_success(account_id)
+        for arn in pending:
+            logging.error(f"리소스 {arn}의 태그 검증 실패: {max_retries}회 재시도 후에도 기대한 태그 상태가 아닙니다.")
+
+    logging.info(f"태그 검증 완료: {len(tagged_resources)}개 중 {len(verified_resources)}개 확인")
+    return verified_resources
+
+def apply_tags(session_cache, resources: List[Dict], tag_key: str, tag_value: str = None, removed: bool = False,
+               breaker=None, on_result=None) -> List[Dict]:
+    """입력 프롬프트 없이 태그를 추가(또는 removed=True 이면 삭제)한다. 태깅 서비스 등 스크립트 호출용.
+
+    계정/리전별로 묶어서 TagResources/UntagResources 를 호출당 최대 20개 ARN 으로 보내고,
+    on_result(resource, status, message) 로 리소스별 결과('tagged', 'failed', 'skipped')를 알려준다.
+    """
+    breaker = breaker or CircuitBreaker()
+    on_result = on_result or (lambda resource, status, message=None: None)
+    groups = defaultdict(list)
+    for resource in resources:
+        groups[(resource['Account ID'], resolve_tagging_region(resource['Region']))].append(resource)
+
+    def process_group(account_id, region, group):
+        tagged = []
+        for start in range(0, len(group), 20):
+            batch = group[start:start + 20]
+            if breaker.is_blocked(account_id):
+                breaker.skip(account_id, count=len(batch))
+                for resource in batch:
+                    on_result(resource, 'skipped', '서킷 브레이커로 건너뜀')
+                continue
+            try:
+                client = session_cache.client('resourcegroupstaggingapi', account_id, region)
+                arns = [resource['ARN'] for resource in batch]
+                if removed:
+                    response = client.untag_resources(ResourceARNList=arns, TagKeys=[tag_key])
+                else:
+                    response = client.tag_resources(ResourceARNList=arns, Tags={tag_key: tag_value})
+                breaker.record_success(account_id)
+            except Exception as e:
+                breaker.record_error(account_id, None, e)
+                logging.error(f"계정 {account_id}, 리전 {region}의 태그 작업 중 오류 발생: {str(e)}")
+                for resource in batch:
+                    on_result(resource, 'failed', str(e))
+                continue
+
+            failed = response.get('FailedResourcesMap') or {}
+            for resource in batch:
+                if resource['ARN'] in failed:
+                    on_result(resource, 'failed', failed[resource['ARN']].get('ErrorMessage'))
+                    continue
+                # parse_tags 는 이미 dict 인 값을 그대로 돌려주므로, 호출자와 공유하는 dict 를 고치지 않도록 복사해서 바꾼다
+                current_tags = dict(parse_tags(resource.get('Tags')))
+                if removed:
+                    current_tags.pop(tag_key, None)
+                else:
+                    current_tags[tag_key] = tag_value
+                resource['Tags'] = current_tags
+                tagged.append(resource)
+                on_result(resource, 'tagged')
+        return tagged
+
+    tagged_resources = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENT_ACCOUNTS) as executor:
+        futures = [executor.submit(process_group, account_id, region, group) for (account_id, region), group in groups.items()]
+        for future in concurrent.futures.as_completed(futures):
+            tagged_resources.extend(future.result())
+    return tagged_resources
+
+def resolve_tagging_region(region: str) -> str:
+    # IAM 같은 글로벌 리소스는 Region 이 'global' 로 기록되므로, 실제 태깅 API 엔드포인트 리전으로 바꿔준다
+    return GLOBAL_TAGGING_REGION if region == 'global' else region
+
 def assume_role(session, account_id, role_name):
-    sts_client = session.client('sts')
-    assumed_role_object = sts_client.assume_role(
-        RoleArn=f"arn:aws:iam::{account_id}:role/{role_name}",
-        RoleSessionName="AssumeRoleSession1"
-    )
-    credentials = assumed_role_object['Credentials']
-    return boto3.Session(
-        aws_access_key_id=credentials['AccessKeyId'],
-        aws_secret_access_key=credentials['SecretAccessKey'],
-        aws_session_token=credentials['SessionToken'],
-    )
\ No newline at end of file
+    return assume_role_with_expiration(session, account_id, role_name)[0]
@@ -0,0 +1,314 @@
+# tagging_service.py
+# 세션, AssumeRole 자격 증명, 클라이언트, 인벤토리 CSV 를 메모리에 유지한 채 localhost HTTP API 로 태깅/조회 작업을 받는 데몬
+# 관리 계정 권한으로 조직 전체를 태깅할 수 있으므로, 시작할 때마다 새 토큰을 만들어 0600 파일에 저장하고
+# /health 외의 모든 요청에 Authorization: Bearer <토큰> 을 요구한다. Host 가 localhost 가 아니거나, POST 가 application/json 이 아니면 거부
+# 실행: python tagging_service.py --csv aws_resources_20240101000000.csv
+# 조회: curl -H "Authorization: Bearer $(cat .tagtool_cache/tagging_service.token)" \
+#            'http://127.0.0.1:8765/resources?account_id=123456789012&resource_type=AWS::S3::Bucket'
+# 태깅: curl -N -X POST http://127.0.0.1:8765/jobs/tag -H "Authorization: Bearer $(cat .tagtool_cache/tagging_service.token)" \
+#            -H 'Content-Type: application/json' \
+#            -d '{"action": "add", "tag_key": "Owner", "tag_value": "team-a", "filters": {"arn_filter": "dev-"}}'
+#       (filters 나 arns 로 대상을 반드시 지정해야 함. 결과는 한 줄에 하나씩 JSON 으로 스트리밍: result / progress / done 이벤트)
+import argparse
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Tuple
+from urllib.parse import urlparse, urlsplit, parse_qs
+
+import boto3
+
+from circuit_breaker import CircuitBreaker
+from config import SSO_PROFILE, TAGGING_SERVICE_HOST, TAGGING_SERVICE_PORT, TAGGING_SERVICE_TOKEN_FILE
+from csv_operations import read_csv_for_tagging, update_csv_with_tagged_resources
+from logging_config import setup_logging
+from session_cache import AssumedSessionCache
+from tagging_operations import apply_tags, verify_tagged_resources
+from utils import parse_tags
+
+PROGRESS_EVENT_INTERVAL = 0.5  # seconds
+JOB_FILTER_KEYS = ('account_id', 'region', 'resource_type', 'arn_filter', 'tag_key', 'tag_value')
+LOCAL_HOSTNAMES = {'localhost', '127.0.0.1', '::1'}
+
+
+class TaggingService:
+    """데몬 프로세스 동안 유지되는 상태. 요청 핸들러 스레드들이 공유한다."""
+
+    def __init__(self, session, inventory_file: str = None, inventory_dir: str = None):
+        self.session = session
+        self.session_cache = AssumedSessionCache(session)
+        # POST /inventory 로 불러올 수 있는 CSV 는 이 디렉터리 안의 파일로 제한
+        self.inventory_dir = os.path.realpath(inventory_dir or (os.path.dirname(inventory_file) if inventory_file else None) or os.getcwd())
+        self.inventory_file = None
+        self.inventory = []
+        # 인벤토리 목록 교체/조회용 락 (AWS 호출 중에는 잡지 않음)과 CSV 파일 갱신을 직렬화하는 락
+        self._inventory_lock = threading.RLock()
+        self._csv_lock = threading.Lock()
+        if inventory_file:
+            self.load_inventory(inventory_file)
+
+    def resolve_inventory_path(self, filename: str) -> str:
+        path = os.path.realpath(os.path.join(self.inventory_dir, filename))
+        if os.path.dirname(path) != self.inventory_dir or not path.endswith('.csv'):
+            raise ValueError(f"inventory must be a .csv file in '{self.inventory_dir}'")
+        return path
+
+    def load_inventory(self, filename: str) -> int:
+        filename = self.resolve_inventory_path(filename)
+        resources = read_csv_for_tagging(filename)
+        for resource in resources:
+            resource['Tags'] = parse_tags(resource.get('Tags'))
+        with self._inventory_lock:
+            self.inventory_file = filename
+            self.inventory = resources
+        logging.info(f"Loaded inventory '{filename}' ({len(resources)} resources)")
+        return len(resources)
+
+    def find_resources(self, filters: Dict) -> List[Dict]:
+        # add_tags_from_csv 와 같은 필터 규칙 (리전 필터는 global 리소스도 포함)
+        arns = set(filters.get('arns') or [])
+        with self._inventory_lock:
+            return [
+                resource for resource in self.inventory
+                if (not arns or resource['ARN'] in arns)
+                and (not filters.get('account_id') or resource['Account ID'] == filters['account_id'])
+                and (not filters.get('region') or resource['Region'] in (filters['region'], 'global'))
+                and (not filters.get('resource_type') or resource['Resource Type'] == filters['resource_type'])
+                and (not filters.get('arn_filter') or filters['arn_filter'] in resource['ARN'])
+                and (not filters.get('tag_key') or (
+                    filters['tag_key'] in resource['Tags']
+                    and (filters.get('tag_value') is None or resource['Tags'][filters['tag_key']] == filters['tag_value'])))
+            ]
+
+    @staticmethod
+    def validate_job(job: Dict) -> Dict:
+        """작업 본문을 확인하고 대상 필터를 돌려준다. 필터 없이 인벤토리 전체를 태깅하는 작업은 거부한다."""
+        if job.get('action', 'add') not in ('add', 'remove') or not job.get('tag_key'):
+            raise ValueError("action must be 'add' or 'remove' and tag_key is required")
+        filters = job.get('filters') or {}
+        if not isinstance(filters, dict) or set(filters) - set(JOB_FILTER_KEYS):
+            raise ValueError(f"filters may only contain {', '.join(JOB_FILTER_KEYS)}")
+        arns = job.get('arns') or []
+        if not any(filters.get(key) for key in JOB_FILTER_KEYS) and not arns:
+            raise ValueError("a tag job needs at least one filter or an arns list")
+        return dict(filters, arns=arns)
+
+    def run_tag_job(self, job: Dict, emit) -> Dict:
+        filters = self.validate_job(job)
+        tag_key = job['tag_key']
+        removed = job.get('action', 'add') == 'remove'
+        tag_value = job.get('tag_value', '')
+
+        # 대상은 filters(/resources 와 같은 조건) 또는 arns 목록으로 지정하고, 이미 원하는 상태인 리소스는 건너뜀
+        # 대상 목록만 락 안에서 뽑고, AWS 호출은 락 밖에서 해서 다른 조회/작업이 기다리지 않게 한다
+        # 작업은 인벤토리 항목의 복사본으로 진행하고, 최종(검증까지 끝난) 결과만 락 안에서 인벤토리에 반영한다
+        with self._inventory_lock:
+            inventory_file = self.inventory_file
+            targets = {
+                resource['ARN']: resource for resource in self.find_resources(filters)
+                if (tag_key in resource['Tags'] if removed else resource['Tags'].get(tag_key, object()) != tag_value)
+            }
+            resources = [dict(resource) for resource in targets.values()]
+        total = len(resources)
+        counts = {'tagged': 0, 'failed': 0, 'skipped': 0}
+        lock = threading.Lock()
+        last_progress = [time.monotonic()]
+
+        def on_result(resource, status, message=None):
+            with lock:
+                counts[status] += 1
+                emit({'event': 'result', 'arn': resource['ARN'], 'status': status, 'message': message})
+                if time.monotonic() - last_progress[0] >= PROGRESS_EVENT_INTERVAL:
+                    last_progress[0] = time.monotonic()
+                    emit({'event': 'progress', 'done': sum(counts.values()), 'total': total})
+
+        breaker = CircuitBreaker()
+        tagged_resources = apply_tags(self.session_cache, resources, tag_key, tag_value, removed, breaker, on_result)
+        if job.get('verify') and tagged_resources:
+            tagged_resources = verify_tagged_resources(self.session, tagged_resources, tag_key, tag_value, removed,
+                                                       breaker=breaker, session_cache=self.session_cache)
+        with self._inventory_lock:
+            for resource in tagged_resources:
+                targets[resource['ARN']]['Tags'] = dict(resource['Tags'])
+        if job.get('update_csv') and tagged_resources and inventory_file:
+            with self._csv_lock:
+                update_csv_with_tagged_resources(inventory_file, tagged_resources)
+
+        summary = {'event': 'done', 'matched': total, 'tagged': len(tagged_resources),
+                   'failed': counts['failed'], 'skipped': counts['skipped'], 'circuit_breaker': breaker.report()}
+        emit(summary)
+        return summary
+
+
+def parse_resource_query(query: str) -> Tuple[Dict, int]:
+    """GET /resources 쿼리 문자열을 (find_resources 필터, limit) 으로 바꾼다. arns 는 arns=...&arns=... 처럼 반복해서 지정."""
+    params = parse_qs(query)
+    limit = params.pop('limit', ['0'])[-1]
+    arns = params.pop('arns', [])
+    unknown = set(params) - set(JOB_FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"unknown query parameters: {', '.join(sorted(unknown))}")
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        raise ValueError("limit must be a non-negative integer")
+    filters = {key: values[-1] for key, values in params.items()}
+    return dict(filters, arns=arns), limit
+
+
+class TaggingRequestHandler(BaseHTTPRequestHandler):
+    service: TaggingService = None
+    token: str = None
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} - {format % args}")
+
+    def _send_json(self, status: int, body) -> None:
+        payload = json.dumps(body, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _check_request(self, require_token: bool = True) -> bool:
+        # 브라우저에서 열린 웹 페이지(DNS 리바인딩 포함)나 다른 로컬 프로세스가 API 를 호출하지 못하도록 막는다
+        try:
+            hostname = urlsplit(f"//{self.headers.get('Host', '')}").hostname
+        except ValueError:
+            hostname = None
+        if hostname not in LOCAL_HOSTNAMES:
+            self._send_json(403, {'error': 'invalid Host header'})
+            return False
+        if require_token:
+            authorization = self.headers.get('Authorization', '')
+            if not (authorization.startswith('Bearer ') and hmac.compare_digest(authorization[len('Bearer '):], self.token)):
+                self._send_json(401, {'error': 'missing or invalid bearer token'})
+                return False
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not self._check_request(require_token=url.path != '/health'):
+            return
+        if url.path == '/health':
+            self._send_json(200, {'status': 'ok', 'inventory': self.service.inventory_file, 'resources': len(self.service.inventory)})
+        elif url.path == '/resources':
+            try:
+                filters, limit = parse_resource_query(url.query)
+            except ValueError as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            resources = self.service.find_resources(filters)
+            self._send_json(200, {'count': len(resources), 'resources': resources[:limit] if limit else resources})
+        else:
+            self._send_json(404, {'error': f"unknown path {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if not self._check_request():
+            return
+        # text/plain 등은 브라우저가 CORS 사전 요청 없이 보낼 수 있으므로 JSON 본문만 받는다
+        if self.headers.get_content_type() != 'application/json':
+            self._send_json(415, {'error': 'Content-Type must be application/json'})
+            return
+        try:
+            body = self._read_json()
+        except ValueError as e:
+            self._send_json(400, {'error': f"invalid JSON: {str(e)}"})
+            return
+
+        if url.path == '/inventory':
+            try:
+                count = self.service.load_inventory(body['filename'])
+            except (KeyError, FileNotFoundError, ValueError) as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            self._send_json(200, {'inventory': body['filename'], 'resources': count})
+        elif url.path == '/jobs/tag':
+            try:
+                self.service.validate_job(body)
+            except ValueError as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            # 결과를 한 줄씩 바로 내보내기 위해 Content-Length 없이 응답하고 연결 종료로 끝을 알린다
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+            self.end_headers()
+
+            client_gone = threading.Event()
+
+            def emit(event):
+                # 클라이언트가 연결을 끊어도 작업은 끝까지 진행해 인벤토리와 CSV 가 어긋나지 않게 한다
+                if client_gone.is_set():
+                    return
+                try:
+                    self.wfile.write(json.dumps(event, ensure_ascii=False, default=str).encode('utf-8') + b'\n')
+                    self.wfile.flush()
+                except OSError as e:
+                    client_gone.set()
+                    logging.warning(f"Client disconnected during tagging job; continuing without streaming: {str(e)}")
+
+            try:
+                self.service.run_tag_job(body, emit)
+            except Exception as e:
+                logging.error(f"Tagging job failed: {str(e)}")
+                emit({'event': 'error', 'error': str(e)})
+        else:
+            self._send_json(404, {'error': f"unknown path {url.path}"})
+
+
+def write_token_file(path: str = TAGGING_SERVICE_TOKEN_FILE) -> str:
+    # 실행할 때마다 새 토큰을 만들고, 같은 사용자만 읽을 수 있도록 0600 으로 저장
+    token = secrets.token_urlsafe(32)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+    return token
+
+def serve(service: TaggingService, token: str, host: str = TAGGING_SERVICE_HOST, port: int = TAGGING_SERVICE_PORT) -> None:
+    handler = type('BoundTaggingRequestHandler', (TaggingRequestHandler,), {'service': service, 'token': token})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    logging.info(f"Tagging service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Tagging service stopped")
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Long-running tagging service with a localhost HTTP API')
+    parser.add_argument('--profile', default=SSO_PROFILE, help='AWS profile name')
+    parser.add_argument('--csv', help='Inventory CSV to keep loaded')
+    parser.add_argument('--inventory-dir', help='Directory that POST /inventory may load CSV files from (default: directory of --csv)')
+    parser.add_argument('--token-file', default=TAGGING_SERVICE_TOKEN_FILE, help='Where to write the bearer token for this run')
+    parser.add_argument('--host', default=TAGGING_SERVICE_HOST, help='Bind address')
+    parser.add_argument('--port', type=int, default=TAGGING_SERVICE_PORT, help='Bind port')
+    args = parser.parse_args()
+    setup_logging()
+
+    service = TaggingService(boto3.Session(profile_name=args.profile), args.csv, args.inventory_dir)
+    token = write_token_file(args.token_file)
+    logging.info(f"Bearer token for this run written to '{args.token_file}'")
+    serve(service, token, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
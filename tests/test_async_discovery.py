@@ -0,0 +1,147 @@
+# test_async_discovery.py
+# asyncio 검색 엔진을 로컬 moto 서버에 대해 실행 (moto[server], aiobotocore 가 없으면 건너뜀)
+# moto 는 get_discovered_resource_counts 를 구현하지 않으므로 리소스 카탈로그 캐시를 미리 채워 둔다
+import asyncio
+import socket
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('aiobotocore')
+moto_server = pytest.importorskip('moto.server')
+
+import boto3
+
+import async_discovery
+from async_discovery import AccountCredentials, RequestLimiter, get_all_resources_with_asyncio
+from config import ASSUME_ROLE_NAME, RESOURCE_CATALOG_CACHE_DIR, REGION_AVAILABILITY_CACHE_DIR
+from resource_catalog import catalog_cache_key
+from utils import read_json_cache, write_json_cache
+
+REGION = 'us-east-1'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def moto_endpoint(monkeypatch, tmp_path):
+    port = _free_port()
+    server = moto_server.ThreadedMotoServer(ip_address='127.0.0.1', port=port)
+    server.start()
+    endpoint = f"http://127.0.0.1:{port}"
+    # moto 백엔드 상태는 프로세스 전역이므로 이전 테스트의 조직/계정을 지운다
+    urllib.request.urlopen(urllib.request.Request(f"{endpoint}/moto-api/reset", method='POST')).close()
+    monkeypatch.setenv('AWS_ENDPOINT_URL', endpoint)
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', REGION)
+    monkeypatch.delenv('AWS_PROFILE', raising=False)
+    # .tagtool_cache 를 테스트마다 새로 만들도록 임시 디렉터리에서 실행
+    monkeypatch.chdir(tmp_path)
+    yield endpoint
+    server.stop()
+
+
+def _member_session(session, account_id):
+    credentials = session.client('sts').assume_role(
+        RoleArn=f"arn:aws:iam::{account_id}:role/{ASSUME_ROLE_NAME}", RoleSessionName='test'
+    )['Credentials']
+    return boto3.Session(
+        aws_access_key_id=credentials['AccessKeyId'],
+        aws_secret_access_key=credentials['SecretAccessKey'],
+        aws_session_token=credentials['SessionToken'],
+        region_name=REGION,
+    )
+
+
+def _setup_member_account(session):
+    org_client = session.client('organizations')
+    org_client.create_organization(FeatureSet='ALL')
+    account_id = org_client.create_account(AccountName='member', Email='member@example.com')['CreateAccountStatus']['AccountId']
+
+    member = _member_session(session, account_id)
+    member.client('config').put_configuration_recorder(ConfigurationRecorder={
+        'name': 'default',
+        'roleARN': f"arn:aws:iam::{account_id}:role/config",
+        'recordingGroup': {'allSupported': True, 'includeGlobalResourceTypes': False},
+    })
+    s3_client = member.client('s3')
+    for name in ('tagtool-a', 'tagtool-b'):
+        s3_client.create_bucket(Bucket=name)
+    s3_client.put_bucket_tagging(Bucket='tagtool-a', Tagging={'TagSet': [{'Key': 'Owner', 'Value': 'team-a'}]})
+    write_json_cache(RESOURCE_CATALOG_CACHE_DIR, catalog_cache_key(account_id, REGION), {'AWS::S3::Bucket': 2})
+    return account_id
+
+
+def test_async_discovery_against_moto_server(moto_endpoint):
+    session = boto3.Session(region_name=REGION)
+    account_id = _setup_member_account(session)
+
+    resources, accounts_with_many_resources = get_all_resources_with_asyncio(
+        session, [REGION], account_ids=[account_id], auto_regions=False
+    )
+
+    by_arn = {resource['ARN']: resource for resource in resources}
+    assert set(by_arn) == {'arn:aws:s3:::tagtool-a', 'arn:aws:s3:::tagtool-b'}
+    assert all(resource['Account ID'] == account_id for resource in resources)
+    assert by_arn['arn:aws:s3:::tagtool-a']['Tags'] == {'Owner': 'team-a'}
+    assert accounts_with_many_resources == []
+
+
+def test_async_auto_regions_probe_under_limiter(moto_endpoint):
+    # 리전 확인도 aiobotocore 로 수행해 스레드 엔진과 같은 캐시에 저장하고, 레코더가 있는 리전만 검색한다
+    session = boto3.Session(region_name=REGION)
+    account_id = _setup_member_account(session)
+
+    resources, _ = get_all_resources_with_asyncio(session, [REGION], account_ids=[account_id], auto_regions=True)
+
+    assert {resource['ARN'] for resource in resources} == {'arn:aws:s3:::tagtool-a', 'arn:aws:s3:::tagtool-b'}
+    availability = read_json_cache(REGION_AVAILABILITY_CACHE_DIR, account_id, ttl=3600)
+    assert availability[REGION] is True
+    assert len(availability) > 1 and not any(enabled for region, enabled in availability.items() if region != REGION)
+
+
+def test_request_limiter_does_not_block_other_accounts():
+    # 한 계정이 계정 한도를 꽉 채워도 다른 계정의 요청은 전체/리전 슬롯을 기다리지 않고 바로 시작해야 한다
+    # (시간 대신 순서로 확인: B 의 첫 요청은 A 의 요청이 하나도 끝나기 전에 시작해야 한다)
+    async def run():
+        limiter = RequestLimiter(max_requests=100, max_per_account=20, max_per_region=50)
+        started = {}
+        finished = []
+
+        async def request(account_id):
+            async with limiter.slot(account_id, REGION):
+                started.setdefault(account_id, len(finished))
+                await asyncio.sleep(0.01)
+            finished.append(account_id)
+
+        await asyncio.gather(*(request('A') for _ in range(400)), *(request('B') for _ in range(40)))
+        return started['B']
+
+    assert asyncio.run(run()) == 0
+
+
+def test_account_credentials_reassume_before_expiry(monkeypatch):
+    # 만료까지 SESSION_REFRESH_MARGIN 보다 적게 남은 자격 증명은 다시 가정하고, 여유가 있으면 재사용한다
+    calls = []
+
+    async def fake_assume_role(aio_session, limiter, account_id, role_name):
+        calls.append(account_id)
+        return {'aws_session_token': f"token-{len(calls)}"}, datetime.now(timezone.utc) + timedelta(hours=1)
+
+    monkeypatch.setattr(async_discovery, '_assume_role', fake_assume_role)
+
+    async def run():
+        credentials = AccountCredentials(None, RequestLimiter(), '111111111111', ASSUME_ROLE_NAME, refresh_margin=300)
+        tokens = [(await credentials.get())['aws_session_token'] for _ in range(2)]
+        credentials._expiration = datetime.now(timezone.utc) + timedelta(seconds=100)
+        tokens += [(await credentials.get())['aws_session_token'] for _ in range(2)]
+        return tokens
+
+    assert asyncio.run(run()) == ['token-1', 'token-1', 'token-2', 'token-2']
+    assert len(calls) == 2
@@ -0,0 +1,95 @@
+# test_tagging_operations.py
+# 태깅 후 검증(verify_tagged_resources)을 가짜 Resource Groups Tagging API 클라이언트로 확인
+import logging
+
+import pytest
+
+import tagging_operations
+from circuit_breaker import CircuitBreaker
+from tagging_operations import verify_tagged_resources
+
+TAG_KEY = 'Owner'
+TAG_VALUE = 'team-a'
+
+
+class FakeTaggingClient:
+    """get_resources 는 visible_after 번째 읽기부터 태그를 돌려주고, failing 에 있는 ARN 은 재적용이 항상 실패한다."""
+
+    def __init__(self, visible_after=None, failing=()):
+        self.visible_after = visible_after or {}
+        self.failing = set(failing)
+        self.reads = 0
+        self.tag_calls = []
+
+    def get_resources(self, ResourceARNList):
+        self.reads += 1
+        return {'ResourceTagMappingList': [
+            {'ResourceARN': arn, 'Tags': [{'Key': TAG_KEY, 'Value': TAG_VALUE}]}
+            for arn in ResourceARNList
+            if arn in self.visible_after and self.reads >= self.visible_after[arn]
+        ]}
+
+    def tag_resources(self, ResourceARNList, Tags):
+        self.tag_calls.append(list(ResourceARNList))
+        return {'FailedResourcesMap': {
+            arn: {'ErrorCode': 'InvalidParameterException', 'ErrorMessage': 'not taggable'}
+            for arn in ResourceARNList if arn in self.failing
+        }}
+
+
+class FakeSessionCache:
+    def __init__(self, clients):
+        self.clients = clients
+
+    def client(self, service, account_id, region):
+        return self.clients[(account_id, region)]
+
+
+def _resource(arn, account_id='111111111111', region='us-east-1'):
+    return {'ARN': arn, 'Account ID': account_id, 'Region': region, 'Resource Type': 'AWS::S3::Bucket', 'Tags': {}}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(tagging_operations.time, 'sleep', calls.append)
+    return calls
+
+
+def test_late_propagation_is_verified_without_retagging(sleeps):
+    client = FakeTaggingClient(visible_after={'arn:late': 2})
+    session_cache = FakeSessionCache({('111111111111', 'us-east-1'): client})
+
+    verified = verify_tagged_resources(None, [_resource('arn:late')], TAG_KEY, TAG_VALUE, session_cache=session_cache)
+
+    assert [resource['ARN'] for resource in verified] == ['arn:late']
+    assert verified[0]['Tags'] == {TAG_KEY: TAG_VALUE}
+    assert client.tag_calls == []
+    assert len(sleeps) == 1
+
+
+def test_failed_reapply_is_dropped_and_logged_once(sleeps, caplog):
+    client = FakeTaggingClient(failing={'arn:bad'})
+    session_cache = FakeSessionCache({('111111111111', 'us-east-1'): client})
+
+    with caplog.at_level(logging.ERROR):
+        verified = verify_tagged_resources(None, [_resource('arn:bad')], TAG_KEY, TAG_VALUE, max_retries=3,
+                                           session_cache=session_cache)
+
+    assert verified == []
+    assert client.tag_calls == [['arn:bad']]
+    messages = [record.getMessage() for record in caplog.records if 'arn:bad' in record.getMessage()]
+    assert len(messages) == 1 and 'InvalidParameterException' in messages[0]
+
+
+def test_wait_is_shared_across_account_regions(sleeps):
+    # 그룹이 많아도 라운드마다 한 번만 기다린다
+    clients = {(f"{index:012d}", 'us-east-1'): FakeTaggingClient(visible_after={f"arn:{index}": 3}) for index in range(50)}
+    resources = [_resource(f"arn:{index}", account_id=account_id) for index, (account_id, _) in enumerate(clients)]
+
+    verified = verify_tagged_resources(None, resources, TAG_KEY, TAG_VALUE, max_retries=3,
+                                       breaker=CircuitBreaker(), session_cache=FakeSessionCache(clients))
+
+    assert len(verified) == 50
+    assert len(sleeps) == 2
+    assert all(len(client.tag_calls) == 1 for client in clients.values())
@@ -1,9 +1,16 @@
 # utils.py
 import sys
 import os
+import ast
+import json
+import logging
+import random
+import tempfile
+import time
 
 from typing import List, Dict
 from datetime import datetime
+from urllib.parse import quote
 
 def select_account_or_resource(resources: List[Dict]) -> List[Dict]:
     print("\n1. 특정 AWS 계정 선택")
@@ -38,9 +45,49 @@ def get_csv_filename(default_prefix):
         except UnicodeDecodeError:
             return os.read(0, 1024).decode('iso-8859-1').strip()
 
+def exponential_backoff(retry_count):
+    return min(2 ** retry_count + random.random(), 60)
+
 def safe_input(prompt):
     print(prompt, end='', flush=True)
     try:
         return os.read(0, 1024).decode('utf-8').strip()
     except UnicodeDecodeError:
-        return os.read(0, 1024).decode('iso-8859-1').strip()
\ No newline at end of file
+        return os.read(0, 1024).decode('iso-8859-1').strip()
+
+# 파일 기반 JSON 캐시. 디렉터리 아래에 key 하나당 파일 하나로 저장 시각과 데이터를 함께 보관하고, TTL 이 지나면 무시한다.
+# key 별 파일을 임시 파일 + os.replace 로 통째로 바꾸므로 잠금 없이도 여러 스레드/프로세스(샤드)가 동시에 써도 다른 key 가 사라지지 않는다.
+def _cache_path(directory, key):
+    return os.path.join(directory, quote(str(key), safe='') + '.json')
+
+def read_json_cache(directory, key, ttl):
+    path = _cache_path(directory, key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (ValueError, OSError) as e:
+        logging.warning(f"캐시 파일 '{path}'을 읽을 수 없어 무시합니다: {str(e)}")
+        return None
+    if time.time() - entry.get('saved_at', 0) > ttl:
+        return None
+    return entry['data']
+
+def write_json_cache(directory, key, data):
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False, encoding='utf-8') as f:
+        json.dump({'saved_at': time.time(), 'data': data}, f)
+    os.replace(f.name, _cache_path(directory, key))
+
+def parse_tags(value) -> Dict:
+    # CSV 의 Tags 컬럼은 str(dict) 형태로 저장되므로 안전하게 딕셔너리로 되돌린다
+    if isinstance(value, dict):
+        return value
+    if not value:
+        return {}
+    try:
+        tags = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return {}
+    return tags if isinstance(tags, dict) else {}